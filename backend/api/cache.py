@@ -0,0 +1,224 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.db.models import Count, Max
+from rest_framework.settings import api_settings
+
+from recipes.models import Ingredient, Tag
+from .serializers import IngredientSerializer, TagSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ShortLinkCache:
+    """Код короткой ссылки -> id рецепта; 0 означает несуществующий код.
+
+    Счётчики попаданий ведутся в памяти процесса.
+    """
+
+    key_prefix = 'short_link:'
+
+    def __init__(self):
+        self.local = LRUCache(
+            settings.SHORT_LINK_CACHE_SIZE,
+            settings.SHORT_LINK_CACHE_LOCAL_TIMEOUT,
+        )
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @property
+    def shared(self):
+        alias = settings.SHORT_LINK_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get(self, code):
+        recipe_id = self.local.get(code)
+        if recipe_id is not None:
+            self.count('local_hits')
+            return recipe_id
+        if self.shared is not None:
+            recipe_id = self.shared.get(self.key_prefix + code)
+            if recipe_id is not None:
+                self.count('shared_hits')
+                self.local.set(code, recipe_id)
+                return recipe_id
+        self.count('misses')
+        return None
+
+    def set(self, code, recipe_id):
+        self.local.set(code, recipe_id)
+        if self.shared is not None:
+            self.shared.set(
+                self.key_prefix + code,
+                recipe_id,
+                settings.SHORT_LINK_CACHE_TIMEOUT if recipe_id
+                else settings.SHORT_LINK_CACHE_NEGATIVE_TIMEOUT,
+            )
+
+    def delete(self, *codes):
+        for code in codes:
+            self.local.delete(code)
+        if self.shared is not None:
+            self.shared.delete_many([self.key_prefix + code for code in codes])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+            }
+
+
+short_link_cache = ShortLinkCache()
+
+
+class CatalogueCache:
+    """Готовые JSON-ответы справочников тегов и ингредиентов.
+
+    Версия справочника вычисляется по данным: последняя дата изменения
+    и количество записей, поэтому она одинакова во всех процессах и
+    меняется только вместе с данными. Байты ответа хранятся в памяти
+    процесса под этой версией не дольше CATALOGUE_CACHE_TIMEOUT секунд,
+    чтобы подхватить изменения, не затронувшие updated_at.
+    """
+
+    catalogues = {
+        'tags': (Tag, TagSerializer),
+        'ingredients': (Ingredient, IngredientSerializer),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rendered = {}
+
+    @property
+    def renderer_class(self):
+        return api_settings.DEFAULT_RENDERER_CLASSES[0]
+
+    def get_version(self, name):
+        model = self.catalogues[name][0]
+        # Удаление не меняет дату, поэтому в версию входит и количество.
+        version = model.objects.aggregate(
+            updated_at=Max('updated_at'), count=Count('id')
+        )
+        return version['updated_at'], version['count']
+
+    def render(self, name):
+        model, serializer_class = self.catalogues[name]
+        data = serializer_class(model.objects.all(), many=True).data
+        return self.renderer_class().render(data)
+
+    def get(self, name, version=None):
+        """Возвращает байты ответа для версии справочника."""
+        if version is None:
+            version = self.get_version(name)
+        rendered = self._rendered.get(name)
+        if (rendered is None or rendered[0] != version
+                or rendered[1] < time.monotonic()):
+            rendered = (
+                version,
+                time.monotonic() + settings.CATALOGUE_CACHE_TIMEOUT,
+                self.render(name),
+            )
+            with self._lock:
+                self._rendered[name] = rendered
+        return rendered[2]
+
+    def warm(self):
+        for name in self.catalogues:
+            try:
+                self.get(name)
+            except DatabaseError:
+                logger.warning('Справочник %s не загружен в кэш', name)
+
+
+catalogue_cache = CatalogueCache()
+
+
+class RecipeFragmentCache:
+    """Общая для всех пользователей часть ответа с рецептом.
+
+    Ключ содержит версию рецепта, поэтому устаревшие фрагменты просто
+    перестают запрашиваться. Флаги пользователя подставляются в копию.
+    """
+
+    key_prefix = 'recipe_fragment:'
+
+    @property
+    def shared(self):
+        return caches[settings.RECIPE_FRAGMENT_CACHE_ALIAS]
+
+    def get_key(self, recipe_id, version):
+        digest = hashlib.md5(repr(version).encode()).hexdigest()
+        return f'{self.key_prefix}{recipe_id}:{digest}'
+
+    def get(self, key):
+        return self.shared.get(key)
+
+    def set(self, key, fragment):
+        self.shared.set(
+            key, fragment, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT
+        )
+
+    @staticmethod
+    def merge(fragment, is_favorited, is_in_shopping_cart,
+              author_is_subscribed):
+        data = dict(fragment)
+        data['author'] = dict(
+            fragment['author'], is_subscribed=author_is_subscribed
+        )
+        data['is_favorited'] = is_favorited
+        data['is_in_shopping_cart'] = is_in_shopping_cart
+        return data
+
+
+recipe_fragment_cache = RecipeFragmentCache()
@@ -0,0 +1,54 @@
+import csv
+import json
+
+from recipes.models import ShoppingListItem
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+def shopping_cart_ingredients(user):
+    return ShoppingListItem.objects.filter(author=user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Ingredient', 'Amount'])
+    for name, measurement_unit, amount in ingredients:
+        yield writer.writerow([name, measurement_unit, amount])
+
+
+def export_txt(ingredients):
+    for name, measurement_unit, amount in ingredients:
+        yield f'{name} ({measurement_unit}) — {amount}\n'
+
+
+def export_json(ingredients):
+    separator = '['
+    for name, measurement_unit, amount in ingredients:
+        yield separator + json.dumps(
+            {
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            },
+            ensure_ascii=False
+        )
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+EXPORT_FORMATS = {
+    'csv': export_csv,
+    'txt': export_txt,
+    'json': export_json,
+}
@@ -1,14 +1,130 @@
-import base64
+import binascii
+from io import BytesIO
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile,
+    TemporaryUploadedFile,
+)
+from PIL import Image
 from rest_framework import serializers
 
+IMAGE_EXTENSIONS = ('jpeg', 'jpg', 'png', 'gif', 'webp')
+IMAGE_SIGNATURES = {
+    'jpeg': (b'\xff\xd8\xff',),
+    'jpg': (b'\xff\xd8\xff',),
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'gif': (b'GIF87a', b'GIF89a'),
+    'webp': (b'RIFF',),
+}
+# Кратно 4, чтобы каждый кусок декодировался независимо.
+CHUNK_SIZE = 64 * 1024
+HEADER_SEPARATOR = ';base64,'
+
+INVALID_IMAGE = 'Загрузите правильное изображение в формате base64.'
+
+
+def check_signature(head, extension):
+    signatures = IMAGE_SIGNATURES.get(extension)
+    if signatures is None:
+        return
+    if not head.startswith(signatures) or (
+        extension == 'webp' and head[8:12] != b'WEBP'
+    ):
+        raise serializers.ValidationError(INVALID_IMAGE)
+
+
+def check_dimensions(file):
+    """Возвращает False, если заголовок изображения ещё не прочитан."""
+    file.seek(0)
+    try:
+        width, height = Image.open(file).size
+    except OSError:
+        return False
+    except Image.DecompressionBombError:
+        width = height = None
+    if width is None or width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise serializers.ValidationError(
+            'Слишком большое разрешение изображения.'
+        )
+    return True
+
+
+def decode_base64_image(data, name='temp'):
+    """Декодирует data URI по частям во временный файл загрузки.
+
+    Размер проверяется по длине base64 до декодирования, сигнатура
+    и размеры изображения — по первым декодированным байтам.
+    """
+    if not isinstance(data, str) or not data.startswith('data:image/'):
+        raise serializers.ValidationError(INVALID_IMAGE)
+    start = data.find(HEADER_SEPARATOR, 0, 256)
+    if start == -1:
+        raise serializers.ValidationError(INVALID_IMAGE)
+    content_type = data[len('data:'):start]
+    extension = content_type.split('/')[-1].lower()
+    start += len(HEADER_SEPARATOR)
+    size = (len(data) - start) * 3 // 4 - data[-2:].count('=')
+    if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise serializers.ValidationError(
+            'Размер изображения не может превышать '
+            f'{settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.'
+        )
+    name = f'{name}.{extension}'
+    if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+        upload = TemporaryUploadedFile(name, content_type, size, None)
+    else:
+        upload = InMemoryUploadedFile(
+            BytesIO(), None, name, content_type, size, None
+        )
+    try:
+        checked = False
+        rest = ''
+        for position in range(start, len(data), CHUNK_SIZE):
+            chunk = rest + ''.join(
+                data[position:position + CHUNK_SIZE].split()
+            )
+            end = len(chunk) - len(chunk) % 4
+            chunk, rest = chunk[:end], chunk[end:]
+            try:
+                upload.file.write(binascii.a2b_base64(chunk))
+            except binascii.Error:
+                raise serializers.ValidationError(INVALID_IMAGE)
+            if position == start:
+                upload.file.seek(0)
+                check_signature(upload.file.read(16), extension)
+                # Заголовок JPEG может не поместиться в первый кусок,
+                # тогда размеры проверяются после декодирования.
+                checked = check_dimensions(upload.file)
+                upload.file.seek(0, 2)
+        if rest or not checked and not check_dimensions(upload.file):
+            raise serializers.ValidationError(INVALID_IMAGE)
+    except serializers.ValidationError:
+        upload.close()
+        raise
+    upload.size = upload.file.seek(0, 2)
+    upload.file.seek(0)
+    return upload
+
 
 class Base64ImageField(serializers.ImageField):
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_base64_image(data)
+        if settings.IMAGE_PROCESSING_ASYNC:
+            # Целиком файл проверит обработчик очереди изображений, здесь
+            # проверяются только расширение и сигнатура.
+            extension = getattr(data, 'name', '').rpartition('.')[2].lower()
+            if extension not in IMAGE_EXTENSIONS:
+                self.fail('invalid_image')
+            data = serializers.FileField.to_internal_value(self, data)
+            data.seek(0)
+            head = data.read(16)
+            data.seek(0)
+            try:
+                check_signature(head, extension)
+            except serializers.ValidationError:
+                self.fail('invalid_image')
+            return data
         return super().to_internal_value(data)
@@ -1,24 +1,80 @@
 import django_filters
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
 
 from recipes.models import Ingredient, Recipe, Tag
 from users.models import User
 
 
+class IngredientSearchBackend:
+
+    def starts_with(self, queryset, value):
+        return queryset.filter(name__istartswith=value)
+
+    def contains(self, queryset, value):
+        return queryset.filter(name__icontains=value)
+
+    def rank(self, queryset, value):
+        return queryset.annotate(
+            starts_with_name=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('starts_with_name', 'name')
+
+
+class TrigramIngredientSearchBackend(IngredientSearchBackend):
+    # LIKE-запросы обслуживает GIN-индекс pg_trgm на UPPER(name),
+    # совпадения внутри групп сортируются по триграммному сходству.
+
+    def contains(self, queryset, value):
+        return super().contains(queryset, value).annotate(
+            similarity=TrigramSimilarity('name', value)
+        ).order_by('-similarity', 'name')
+
+    def rank(self, queryset, value):
+        return super().rank(queryset, value).annotate(
+            similarity=TrigramSimilarity('name', value)
+        ).order_by('starts_with_name', '-similarity', 'name')
+
+
+def get_ingredient_search_backend():
+    if (settings.INGREDIENT_TRIGRAM_SEARCH
+            and connection.vendor == 'postgresql'):
+        return TrigramIngredientSearchBackend()
+    return IngredientSearchBackend()
+
+
 class IngredientFilter(django_filters.FilterSet):
+    name = django_filters.CharFilter(
+        method='filter_name',
+        label='Name'
+    )
     name_starts_with = django_filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith',
+        method='filter_name_starts_with',
         label='Starts with'
     )
     name_contains = django_filters.CharFilter(
-        field_name='name',
-        lookup_expr='icontains',
+        method='filter_name_contains',
         label='Contains'
     )
 
     class Meta:
         model = Ingredient
-        fields = ['name_starts_with', 'name_contains']
+        fields = ['name', 'name_starts_with', 'name_contains']
+
+    def filter_name(self, queryset, name, value):
+        backend = get_ingredient_search_backend()
+        return backend.rank(backend.contains(queryset, value), value)
+
+    def filter_name_starts_with(self, queryset, name, value):
+        return get_ingredient_search_backend().starts_with(queryset, value)
+
+    def filter_name_contains(self, queryset, name, value):
+        return get_ingredient_search_backend().contains(queryset, value)
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -0,0 +1,105 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+RECIPE_IMAGE_VARIANTS = {
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+AVATAR_VARIANTS = {
+    'avatar': (160, 160),
+}
+# Метка модели и поле изображения -> поле с описанием вариантов и размеры.
+IMAGE_FIELDS = {
+    ('recipes.recipe', 'image'): ('image_variants', RECIPE_IMAGE_VARIANTS),
+    ('users.user', 'avatar'): ('avatar_variants', AVATAR_VARIANTS),
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'avif': ('AVIF', {'quality': 60}),
+}
+
+Image.init()
+AVAILABLE_FORMATS = {
+    extension: options for extension, options in VARIANT_FORMATS.items()
+    if options[0] in Image.SAVE
+}
+
+
+def get_variant_name(source, variant, extension):
+    directory, filename = posixpath.split(source)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(
+        directory, 'variants', f'{stem}_{variant}.{extension}'
+    )
+
+
+def get_variant_names(source, variants):
+    return [
+        get_variant_name(source, variant, extension)
+        for variant in variants
+        for extension in VARIANT_FORMATS
+    ]
+
+
+def render_variant(image, size, image_format, options):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    # EXIF и прочие метаданные не передаются, поэтому в вариант не попадают.
+    variant.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(field_file, variants):
+    """Сохраняет уменьшенные копии изображения и возвращает их описание."""
+    storage = field_file.storage
+    files = {}
+    try:
+        with field_file.open('rb') as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image = image.convert(
+                'RGBA' if 'A' in image.getbands()
+                or 'transparency' in image.info else 'RGB'
+            )
+        for variant, size in variants.items():
+            files[variant] = {}
+            for extension, (image_format, options) in (
+                AVAILABLE_FORMATS.items()
+            ):
+                name = get_variant_name(field_file.name, variant, extension)
+                if storage.exists(name):
+                    storage.delete(name)
+                files[variant][extension] = storage.save(name, ContentFile(
+                    render_variant(image, size, image_format, options)
+                ))
+    except (OSError, Image.DecompressionBombError):
+        logger.exception('Не удалось обработать %s', field_file.name)
+        return {'source': field_file.name, 'status': 'failed', 'files': {}}
+    return {'source': field_file.name, 'status': 'ready', 'files': files}
+
+
+def pending_variants(field_file):
+    return {'source': field_file.name, 'status': 'pending', 'files': {}}
+
+
+def get_variant_urls(field_file, variants, request=None):
+    urls = {}
+    for variant, files in variants.get('files', {}).items():
+        urls[variant] = {}
+        for extension, name in files.items():
+            url = field_file.storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[variant][extension] = url
+    return urls
@@ -0,0 +1,86 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import RecipeGetSerializer
+from api.views import RecipeViewSet
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время JSONRenderer и JSONParser DRF с FastJSONRenderer '
+        'и FastJSONParser на списках RecipeGetSerializer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[6, 100, 1000],
+            help='Число рецептов в списке.',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--user',
+            help='Почта пользователя, от имени которого строятся данные.',
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write(
+                'orjson не установлен, быстрые классы используют '
+                'стандартные реализации DRF.'
+            )
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(email=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        view = RecipeViewSet(request=request, format_kwarg=None, action='list')
+        for size in options['sizes']:
+            recipes = list(view.get_queryset()[:size])
+            data = RecipeGetSerializer(
+                recipes, many=True, context={'request': request}
+            ).data
+            content = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != content:
+                raise CommandError(
+                    f'Вывод FastJSONRenderer для {size} рецептов '
+                    'отличается от JSONRenderer.'
+                )
+            render = self.measure(
+                lambda renderer: renderer.render(data),
+                JSONRenderer(), FastJSONRenderer(), options['repeat'],
+            )
+            parse = self.measure(
+                lambda parser: parser.parse(BytesIO(content)),
+                JSONParser(), FastJSONParser(), options['repeat'],
+            )
+            self.stdout.write(
+                f'{len(recipes)} рецептов ({len(content) / 1024:.0f} КБ): '
+                f'рендер {render[0]:.2f} -> {render[1]:.2f} мс, '
+                f'разбор {parse[0]:.2f} -> {parse[1]:.2f} мс'
+            )
+
+    def measure(self, run, standard, fast, repeat):
+        timings = []
+        for implementation in (standard, fast):
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run(implementation)
+                best = min(best, time.perf_counter() - started)
+            timings.append(best * 1000)
+        return timings
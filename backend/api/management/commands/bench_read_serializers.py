@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import CustomUserViewSet, RecipeViewSet
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время ответов списков рецептов и подписок '
+        'с сериализаторами и с FAST_READ_SERIALIZERS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            nargs='+',
+            default=[6, 100, 1000],
+            help='Размеры страниц.',
+        )
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument(
+            '--user',
+            help='Почта пользователя, от имени которого идут запросы.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(email=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+        views = (
+            ('recipes', RecipeViewSet.as_view({'get': 'list'})),
+            ('subscriptions', CustomUserViewSet.as_view(
+                {'get': 'subscriptions'}
+            )),
+        )
+        for limit in options['limit']:
+            for name, view in views:
+                slow = self.measure(view, user, limit, False, options)
+                fast = self.measure(view, user, limit, True, options)
+                self.stdout.write(
+                    f'{name}, limit={limit}: {slow:.1f} мс -> {fast:.1f} мс '
+                    f'({slow / fast:.1f}x)'
+                )
+
+    def measure(self, view, user, limit, fast, options):
+        factory = APIRequestFactory()
+        best = float('inf')
+        with override_settings(FAST_READ_SERIALIZERS=fast):
+            for _ in range(options['repeat']):
+                request = factory.get('/', {'limit': limit})
+                force_authenticate(request, user)
+                started = time.perf_counter()
+                view(request).render()
+                best = min(best, time.perf_counter() - started)
+        return best * 1000
@@ -0,0 +1,107 @@
+import csv
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+from django.http import HttpResponse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from recipes.models import RecipeIngredient
+from users.models import User
+
+
+def legacy_export(user):
+    """Прежняя выгрузка: агрегация по корзине и CSV целиком в памяти."""
+    ingredients = RecipeIngredient.objects.filter(
+        recipe__shopping_cart__author=user
+    ).values('ingredient__name', 'ingredient__measurement_unit').annotate(
+        ingredients_amount=Sum('amount')
+    )
+    response = HttpResponse(content_type='text/csv')
+    writer = csv.writer(response)
+    writer.writerow(['Ingredient', 'Amount'])
+    for ingredient in ingredients:
+        writer.writerow([
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['ingredients_amount'],
+        ])
+    return response
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время до первого байта, полное время и пик памяти '
+        'потоковой выгрузки списка покупок с прежней выгрузкой в памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Почта пользователя; по умолчанию с самым длинным списком.',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'txt', 'json'),
+            default='csv',
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        # Рендереры выгрузки заданы в @action, роутер передаёт их так же.
+        view = RecipeViewSet.as_view(
+            {'get': 'download_shopping_cart'},
+            **RecipeViewSet.download_shopping_cart.kwargs
+        )
+        factory = APIRequestFactory()
+
+        def stream():
+            request = factory.get('/', {'format': options['format']})
+            force_authenticate(request, user)
+            return iter(view(request).streaming_content)
+
+        def legacy():
+            return iter([legacy_export(user).content])
+
+        for name, export in (('прежняя', legacy), ('потоковая', stream)):
+            first, total, size = self.measure(export, options['repeat'])
+            peak = self.measure_memory(export)
+            self.stdout.write(
+                f'{name}: первый байт {first:.1f} мс, всего {total:.1f} мс, '
+                f'{size / 1024:.0f} КБ, пик памяти {peak / 1024:.0f} КБ'
+            )
+
+    def get_user(self, email):
+        if email:
+            user = User.objects.filter(email=email).first()
+        else:
+            user = User.objects.annotate(
+                items=Count('shopping_list')
+            ).order_by('-items').first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+        return user
+
+    def measure(self, export, repeat):
+        first = total = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            chunks = export()
+            size = len(next(chunks, b''))
+            first = min(first, time.perf_counter() - started)
+            size += sum(len(chunk) for chunk in chunks)
+            total = min(total, time.perf_counter() - started)
+        return first * 1000, total * 1000, size
+
+    def measure_memory(self, export):
+        # Пик выделений Python за одну выгрузку, а не RSS процесса.
+        tracemalloc.start()
+        try:
+            for _ in export():
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,136 @@
+import os
+import shutil
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.models import ImageTask, MediaBlob
+from api.images import IMAGE_FIELDS, get_variant_names
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = 'Удаляет из MEDIA_ROOT изображения, на которые нет ссылок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать найденные файлы.',
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Переносить файлы в этот каталог вместо удаления.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Не трогать файлы моложе этого числа секунд.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        referenced = self.get_referenced()
+        self.stdout.write(
+            f'Ссылок в базе: {len(referenced)} '
+            f'({time.monotonic() - started:.1f} с).'
+        )
+        newest = time.time() - options['min_age']
+        scanned = orphans = freed = 0
+        batch = []
+        for directory in self.get_directories():
+            path = os.path.join(settings.MEDIA_ROOT, directory)
+            for entry in self.scan(path):
+                scanned += 1
+                name = os.path.relpath(entry.path, settings.MEDIA_ROOT)
+                if name in referenced:
+                    continue
+                stat = entry.stat()
+                if stat.st_mtime > newest:
+                    continue
+                orphans += 1
+                freed += stat.st_size
+                batch.append(name)
+                if len(batch) >= options['batch_size']:
+                    self.remove(batch, options)
+                    batch = []
+        self.remove(batch, options)
+        elapsed = time.monotonic() - started
+        action = 'Найдено' if options['dry_run'] else 'Обработано'
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {scanned}. {action} лишних: {orphans} '
+            f'({freed / (1024 * 1024):.1f} МБ) за {elapsed:.1f} с, '
+            f'{scanned / elapsed if elapsed else scanned:.0f} файлов/с.'
+        ))
+
+    def get_directories(self):
+        directories = set()
+        for label, field_name in IMAGE_FIELDS:
+            field = apps.get_model(label)._meta.get_field(field_name)
+            directories.add(str(field.upload_to).strip('/'))
+        return sorted(directories)
+
+    def get_referenced(self):
+        referenced = set()
+        for (label, field_name), (variants_name, variants) in (
+            IMAGE_FIELDS.items()
+        ):
+            rows = apps.get_model(label).objects.exclude(
+                **{field_name: ''}
+            ).exclude(**{field_name: None}).values_list(
+                field_name, variants_name
+            )
+            for name, current in rows.iterator(chunk_size=CHUNK_SIZE):
+                referenced.add(name)
+                referenced.update(get_variant_names(name, variants))
+                for files in current.get('files', {}).values():
+                    referenced.update(files.values())
+        # Файлы, которые ещё обрабатываются или учтены в счётчиках ссылок.
+        referenced.update(
+            ImageTask.objects.filter(
+                status__in=(ImageTask.PENDING, ImageTask.PROCESSING)
+            ).values_list(
+                'source', flat=True
+            ).iterator(chunk_size=CHUNK_SIZE)
+        )
+        referenced.update(
+            MediaBlob.objects.values_list('name', flat=True).iterator(
+                chunk_size=CHUNK_SIZE
+            )
+        )
+        return referenced
+
+    def scan(self, path):
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self.scan(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+    def remove(self, batch, options):
+        for name in batch:
+            if options['dry_run']:
+                self.stdout.write(name)
+                continue
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if options['quarantine']:
+                target = os.path.join(options['quarantine'], name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        if batch and not options['dry_run'] and options['verbosity'] > 1:
+            self.stdout.write(f'Пакет из {len(batch)} файлов обработан.')
@@ -0,0 +1,86 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import tasks
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь загруженных изображений.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Число процессов; 0 — обрабатывать в текущем процессе.',
+        )
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--requeue-after',
+            type=int,
+            default=300,
+            help='Через сколько секунд вернуть в очередь зависшую задачу.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь и завершиться.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.IMAGE_PROCESSING_ASYNC:
+            self.stderr.write(
+                'IMAGE_PROCESSING_ASYNC выключен: изображения обрабатываются '
+                'в запросе, новые задачи в очередь не попадут.'
+            )
+        pool = None
+        if options['workers']:
+            pool = ProcessPoolExecutor(
+                options['workers'],
+                mp_context=multiprocessing.get_context('fork'),
+            )
+        try:
+            while True:
+                tasks.requeue_stalled(options['requeue_after'])
+                task_ids = tasks.claim_tasks(options['batch_size'])
+                if task_ids:
+                    self.process(pool, task_ids)
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def process(self, pool, task_ids):
+        if pool is not None:
+            # Дочерние процессы не должны наследовать открытые соединения.
+            connections.close_all()
+            futures = [
+                pool.submit(tasks.process_image_task, task_id)
+                for task_id in task_ids
+            ]
+        for position, task_id in enumerate(task_ids):
+            try:
+                if pool is None:
+                    result = tasks.process_image_task(task_id)
+                else:
+                    result = futures[position].result()
+            except Exception as error:
+                # Задача останется в обработке и вернётся в очередь
+                # через --requeue-after.
+                self.stderr.write(f'Задача {task_id}: {error!r}')
+                continue
+            self.stdout.write(f'Задача {task_id}: {result}')
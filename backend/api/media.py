@@ -0,0 +1,107 @@
+"""Учёт ссылок на файлы изображений с именами по содержимому.
+
+Один файл может принадлежать нескольким рецептам и пользователям,
+поэтому он удаляется вместе с вариантами, только когда на него не
+осталось ссылок.
+
+Строка MediaBlob без ссылок остаётся до удаления файлов: загрузка
+(ContentAddressedFieldFile.save) и удаление блокируют её, поэтому
+файл не удаляется между проверкой его наличия и учётом новой ссылки.
+"""
+from django.db import transaction
+
+from foodgram.storage import lock_blob
+from recipes.models import MediaBlob
+from .images import IMAGE_FIELDS, get_variant_names
+
+
+def acquire(name):
+    if not name:
+        return
+    with transaction.atomic():
+        blob = lock_blob(name)
+        blob.refcount += 1
+        blob.save(update_fields=('refcount',))
+
+
+def release(storage, name, variants):
+    if not name:
+        return
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(
+            name=name
+        ).first()
+        if blob is None or not blob.refcount:
+            # Файл не учтён, например загружен вручную, или уже
+            # ожидает удаления — не трогаем.
+            return
+        blob.refcount -= 1
+        blob.save(update_fields=('refcount',))
+        if blob.refcount:
+            return
+
+    def delete_files():
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(
+                name=name
+            ).first()
+            # Тот же файл мог быть загружен заново до фиксации
+            # транзакции или уже удалён другим процессом.
+            if blob is None or blob.refcount:
+                return
+            for file_name in [name, *get_variant_names(name, variants)]:
+                storage.delete(file_name)
+            blob.delete()
+
+    transaction.on_commit(delete_files)
+
+
+def get_image_fields(instance):
+    label = instance._meta.label_lower
+    return {
+        field_name: variants
+        for (model_label, field_name), (_, variants) in IMAGE_FIELDS.items()
+        if model_label == label
+    }
+
+
+def remember_names(instance):
+    instance._media_names = {
+        # Пока поле не прочитано, в __dict__ лежит строка из базы.
+        field_name: getattr(
+            instance.__dict__.get(field_name), 'name',
+            instance.__dict__.get(field_name)
+        ) or None
+        for field_name in get_image_fields(instance)
+    }
+
+
+def update_references(instance, update_fields=None):
+    names = getattr(instance, '_media_names', {})
+    for field_name, variants in get_image_fields(instance).items():
+        if field_name not in instance.__dict__ or (
+            update_fields is not None and field_name not in update_fields
+        ):
+            # Отложенное или не сохранённое поле не изменилось.
+            continue
+        field_file = getattr(instance, field_name)
+        old_name = names.get(field_name)
+        # Ссылку на загруженный файл уже учёл field_file.save().
+        acquired = getattr(instance, '_acquired_media', {}).pop(
+            field_name, None
+        ) == field_file.name
+        if old_name == (field_file.name or None):
+            if acquired:
+                # Повторная загрузка того же файла: лишняя ссылка.
+                release(field_file.storage, old_name, variants)
+            continue
+        if not acquired:
+            acquire(field_file.name)
+        release(field_file.storage, old_name, variants)
+    remember_names(instance)
+
+
+def release_references(instance):
+    for field_name, variants in get_image_fields(instance).items():
+        field_file = getattr(instance, field_name)
+        release(field_file.storage, field_file.name, variants)
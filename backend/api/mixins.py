@@ -0,0 +1,77 @@
+import hashlib
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """Ответ 304 Not Modified по версии данных без их сериализации.
+
+    get_list_version() и get_object_version() возвращают пару
+    (версия, дата изменения) или None, если версию не вычислить.
+    Дату изменения стоит возвращать, только если ответ зависит лишь
+    от неё; иначе достаточно ETag.
+    """
+
+    vary_on_user = False
+
+    def get_list_version(self):
+        return None
+
+    def get_object_version(self):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_list_version(), self.list_response,
+            request, *args, **kwargs
+        )
+
+    def list_response(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_object_version(), self.retrieve_response,
+            request, *args, **kwargs
+        )
+
+    def retrieve_response(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_etag(self, version):
+        request = self.request
+        key = repr((
+            version,
+            request.get_host(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            request.user.pk if self.vary_on_user else None,
+        ))
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def conditional_response(self, version, view, request, *args, **kwargs):
+        if version is None:
+            return view(request, *args, **kwargs)
+        version, last_modified = version
+        etag = self.get_etag(version)
+        timestamp = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+        # Клиент должен перепроверять ответ при каждом запросе.
+        patch_cache_control(response, no_cache=True)
+        if self.vary_on_user:
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ('Authorization',))
+        return response
@@ -1,7 +1,247 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FullResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField, Expression, F, QuerySet, Value
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor, CursorPagination, PageNumberPagination
+)
+
+
+def estimate_count(queryset):
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def get_table_rows(queryset):
+    # Оценка размера таблицы из статистики pg_class, без чтения строк.
+    table = queryset.model._meta.db_table
+    key = f'pagination_table_rows:{queryset.db}:{table}'
+    rows = cache.get(key)
+    if rows is None:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [table]
+            )
+            rows = int(cursor.fetchone()[0])
+        cache.set(key, rows, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return rows
+
+
+def get_count_key(queryset):
+    # Ключ строится по условиям выборки: сортировка, аннотации
+    # (в том числе Exists() с id пользователя) и порядок JOIN на
+    # количество не влияют и в ключ не попадают, поэтому он общий
+    # для всех пользователей с одинаковыми фильтрами.
+    query = queryset.order_by().values('pk').query
+    try:
+        where, params = query.get_compiler(queryset.db).compile(query.where)
+    except FullResultSet:
+        where, params = '', []
+    joins = sorted(
+        (join.table_name, join.join_type or '')
+        for alias, join in query.alias_map.items()
+        if query.alias_refcount[alias]
+    )
+    return 'pagination_count:' + hashlib.md5(
+        f'{queryset.db}:{query.distinct}:{joins!r}:{where}:{params!r}'
+        .encode()
+    ).hexdigest()
+
+
+class CountCachingPaginator(Paginator):
+    # Количество объектов кэшируется по условиям выборки на короткое
+    # время, на PostgreSQL выборки из больших таблиц оцениваются
+    # планировщиком.
+    is_count_approximate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        try:
+            key = get_count_key(queryset)
+        except EmptyResultSet:
+            return 0
+        cached = cache.get(key)
+        if cached is not None:
+            count, self.is_count_approximate = cached
+            return count
+        count = None
+        threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+        if (threshold is not None
+                and connections[queryset.db].vendor == 'postgresql'
+                and get_table_rows(queryset) > threshold):
+            estimate = estimate_count(queryset)
+            if estimate > threshold:
+                count = estimate
+                self.is_count_approximate = True
+        if count is None:
+            count = queryset.count()
+        cache.set(
+            key,
+            (count, self.is_count_approximate),
+            settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        )
+        return count
+
+
+class RowComparison(Expression):
+    """Сравнение кортежей: (field1, field2) > (%s, %s)."""
+
+    conditional = True
+    output_field = BooleanField()
+
+    def __init__(self, fields, operator, values):
+        super().__init__()
+        self.fields = [F(field) for field in fields]
+        self.values = [Value(value) for value in values]
+        self.operator = operator
+
+    def get_source_expressions(self):
+        return [*self.fields, *self.values]
+
+    def set_source_expressions(self, expressions):
+        self.fields = expressions[:len(self.fields)]
+        self.values = expressions[len(self.fields):]
+
+    def as_sql(self, compiler, connection):
+        fields, values, params = [], [], []
+        for expressions, sqls in ((self.fields, fields),
+                                  (self.values, values)):
+            for expression in expressions:
+                sql, expression_params = compiler.compile(expression)
+                sqls.append(sql)
+                params.extend(expression_params)
+        return (
+            f'({", ".join(fields)}) {self.operator} ({", ".join(values)})',
+            params
+        )
+
+
+class CustomCursorPagination(CursorPagination):
+    # Курсор хранит значения всех полей ordering, следующая страница
+    # выбирается условием (name, id) > (%s, %s) без OFFSET, поэтому
+    # одинаковые значения первого поля не ограничены offset_cutoff.
+    # Поля ordering должны идти по возрастанию и вместе быть уникальны.
+
+    page_size = 6
+    page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        if reverse:
+            queryset = queryset.order_by(
+                *(f'-{field}' for field in self.ordering)
+            )
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(RowComparison(
+                self.ordering, '<' if reverse else '>', self.position
+            ))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            # Пустой курсор (?cursor=) означает первую страницу.
+            return None
+        try:
+            self.position = json.loads(cursor.position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(self.position, list)
+                or len(self.position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            return [item[field] for field in self.ordering]
+        return [getattr(item, field) for field in self.ordering]
+
+    def get_link(self, item, reverse):
+        # Пустая страница за курсором: ссылка от позиции самого курсора.
+        position = (
+            self.position if item is None else self.get_position(item)
+        )
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=reverse, position=json.dumps(position)
+        ))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.get_link(self.page[-1] if self.page else None, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.get_link(self.page[0] if self.page else None, True)
 
 
 class CustomPagination(PageNumberPagination):
+    # Если в запросе есть параметр cursor (в том числе пустой), страница
+    # строится по ключу cursor_ordering без OFFSET и подсчёта COUNT(*).
+    cursor_ordering = None
 
+    django_paginator_class = CountCachingPaginator
     page_size = 6
     page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if (self.cursor_ordering
+                and CustomCursorPagination.cursor_query_param
+                in request.query_params):
+            self.cursor_paginator = CustomCursorPagination()
+            self.cursor_paginator.ordering = self.cursor_ordering
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        if self.page.paginator.is_count_approximate:
+            response.data['count_is_approximate'] = True
+        return response
+
+
+class RecipePagination(CustomPagination):
+
+    cursor_ordering = ('name', 'id')
+
+
+class SubscriptionPagination(CustomPagination):
+
+    cursor_ordering = ('id',)
@@ -0,0 +1,63 @@
+import codecs
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import orjson
+
+# orjson читает целые вне 64 бит как float, json — без потерь.
+INT64_LIMIT = 2 ** 63
+# Цифры и точка -> "0", e/E -> "e", остальное -> пробел: число не
+# меньше 2 ** 63 в JSON даёт "0e" или не меньше 19 нулей подряд.
+NUMBER_CHARS = bytes(
+    ord('0') if char in '0123456789.' else ord('e') if char in 'eE'
+    else ord(' ')
+    for char in map(chr, range(256))
+)
+
+
+def may_have_large_number(content):
+    # Быстрая проверка байтов до обхода разобранных данных; строки
+    # вроде "5e" или длинные цифры в тексте дают лишь лишний обход.
+    numbers = content.translate(NUMBER_CHARS)
+    return b'0e' in numbers or b'0' * 19 in numbers
+
+
+def has_large_float(data):
+    # Без рекурсии: orjson допускает вложенность глубже лимита Python.
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if abs(value) >= INT64_LIMIT:
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return False
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser на orjson; без orjson работает как стандартный.
+
+    Если в результате есть float за пределами int64, тело разбирается
+    заново стандартным json, чтобы большие целые не стали float.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        content = stream.read()
+        try:
+            data = orjson.loads(content)
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+        if may_have_large_number(content) and has_large_float(data):
+            return super().parse(BytesIO(content), media_type, parser_context)
+        return data
@@ -0,0 +1,177 @@
+"""Быстрое представление списков без сериализаторов DRF.
+
+Словари строятся из строк .values() и совпадают по содержимому и
+порядку полей с выводом RecipeGetSerializer и SubscriptionSerializer.
+"""
+from collections import defaultdict
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+
+from recipes.models import Recipe, RecipeIngredient, Tag
+
+RECIPE_FIELDS = (
+    'id', 'name', 'image', 'image_variants', 'text', 'cooking_time',
+    'author_id', 'author__email', 'author__username', 'author__first_name',
+    'author__last_name', 'author__avatar', 'author__avatar_variants',
+    'is_favorited', 'is_in_shopping_cart', 'author_is_subscribed',
+)
+SUBSCRIPTION_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar',
+    'recipes_count',
+)
+SHORT_RECIPE_FIELDS = (
+    'author_id', 'id', 'name', 'image', 'image_variants', 'cooking_time',
+)
+DOT_SEGMENTS = {'.', '..'}
+
+
+class MediaURLs:
+    """Ссылки на файлы хранилища, как их строят поля сериализаторов.
+
+    Для FileSystemStorage абсолютный префикс вычисляется один раз
+    на ответ, для прочих хранилищ ссылка строится для каждого файла.
+    """
+
+    def __init__(self, storage, request=None):
+        self.storage = storage
+        self.request = request
+        self.prefix = None
+        if isinstance(storage, FileSystemStorage):
+            base_url = storage.base_url
+            if request is not None:
+                base_url = request.build_absolute_uri(base_url)
+            if base_url.endswith('/'):
+                self.prefix = base_url
+
+    def url(self, name):
+        if self.prefix is not None:
+            path = filepath_to_uri(name).lstrip('/')
+            # Сегменты "." и ".." urljoin() схлопывает, их не склеиваем.
+            if not DOT_SEGMENTS.intersection(path.split('/')):
+                return self.prefix + path
+        url = self.storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def image(self, name):
+        if not name:
+            return None
+        return self.url(name)
+
+    def variants(self, variants):
+        return {
+            variant: {
+                extension: self.url(name)
+                for extension, name in files.items()
+            }
+            for variant, files in variants.get('files', {}).items()
+        }
+
+
+def get_media_urls(request=None):
+    return MediaURLs(Recipe._meta.get_field('image').storage, request)
+
+
+def get_recipe_tags(recipe_ids):
+    tags = defaultdict(list)
+    rows = Tag.objects.filter(recipes__in=recipe_ids).values_list(
+        'recipes', 'id', 'name', 'slug'
+    )
+    for recipe_id, tag_id, name, slug in rows:
+        tags[recipe_id].append({'id': tag_id, 'name': name, 'slug': slug})
+    return tags
+
+
+def get_recipe_ingredients(recipe_ids):
+    ingredients = defaultdict(list)
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    )
+    for recipe_id, ingredient_id, name, measurement_unit, amount in rows:
+        ingredients[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def represent_recipes(rows, request):
+    """Рецепты в формате RecipeGetSerializer из строк RECIPE_FIELDS."""
+    recipe_ids = [row['id'] for row in rows]
+    tags = get_recipe_tags(recipe_ids)
+    ingredients = get_recipe_ingredients(recipe_ids)
+    urls = get_media_urls(request)
+    return [
+        {
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'author': {
+                'email': row['author__email'],
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'avatar': urls.image(row['author__avatar']),
+                'avatar_variants': urls.variants(
+                    row['author__avatar_variants']
+                ),
+                'avatar_status': row['author__avatar_variants'].get('status'),
+                'is_subscribed': row['author_is_subscribed'],
+            },
+            'ingredients': ingredients[row['id']],
+            'name': row['name'],
+            'image': urls.image(row['image']),
+            'image_variants': urls.variants(row['image_variants']),
+            'image_status': row['image_variants'].get('status'),
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+            'is_favorited': row['is_favorited'],
+            'is_in_shopping_cart': row['is_in_shopping_cart'],
+        }
+        for row in rows
+    ]
+
+
+def represent_short_recipe(row, urls):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'image': urls.image(row['image']),
+        'image_variants': urls.variants(row['image_variants']),
+        'cooking_time': row['cooking_time'],
+    }
+
+
+def represent_subscriptions(rows, recipe_rows, request):
+    """Подписки в формате SubscriptionSerializer.
+
+    Вложенные рецепты, как и в сериализаторе, со ссылками без хоста.
+    """
+    author_urls = get_media_urls(request)
+    recipe_urls = get_media_urls()
+    recipes = defaultdict(list)
+    for row in recipe_rows:
+        recipes[row['author_id']].append(
+            represent_short_recipe(row, recipe_urls)
+        )
+    return [
+        {
+            'email': row['email'],
+            'id': row['id'],
+            'username': row['username'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'is_subscribed': True,
+            'recipes': recipes[row['id']],
+            'recipes_count': row['recipes_count'],
+            'avatar': author_urls.image(row['avatar']),
+        }
+        for row in rows
+    ]
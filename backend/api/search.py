@@ -0,0 +1,98 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Поиск ингредиентов по названию в памяти процесса.
+
+    Справочник загружается при первом поиске и перечитывается, когда
+    меняется версия справочника (catalogue_cache.get_version), в том
+    числе после изменений из других процессов. Сигналы и таймаут
+    сбрасывают его и без версии.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._expires = 0
+
+    def _load(self):
+        ingredients = Ingredient.objects.values(
+            'id', 'name', 'measurement_unit'
+        )
+        if ingredients.count() > settings.INGREDIENT_INDEX_MAX_SIZE:
+            return None
+        entries = sorted(
+            ((normalize(ingredient['name']), ingredient['id']), ingredient)
+            for ingredient in ingredients
+        )
+        return (
+            [key[0] for key, _ in entries],
+            [ingredient for _, ingredient in entries],
+        )
+
+    def get_snapshot(self, version=None):
+        with self._lock:
+            if self._expires < time.monotonic() or (
+                version is not None and version != self._version
+            ):
+                self._snapshot = self._load()
+                self._version = version
+                self._expires = (
+                    time.monotonic() + settings.INGREDIENT_INDEX_TIMEOUT
+                )
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._expires = 0
+
+    def search(self, name=None, starts_with=None, contains=None,
+               version=None):
+        """Возвращает None, если справочник слишком велик для индекса."""
+        snapshot = self.get_snapshot(version)
+        if snapshot is None:
+            return None
+        names, ingredients = snapshot
+        positions = range(len(names))
+        if starts_with:
+            positions = self._starting_with(names, normalize(starts_with))
+        if contains:
+            contains = normalize(contains)
+            positions = [
+                position for position in positions
+                if contains in names[position]
+            ]
+        if name:
+            name = normalize(name)
+            starting = self._starting_with(names, name)
+            first = set(starting)
+            positions = [
+                position for position in positions if position in first
+            ] + [
+                position for position in positions
+                if position not in first and name in names[position]
+            ]
+        return [ingredients[position] for position in positions]
+
+    @staticmethod
+    def _starting_with(names, prefix):
+        start = bisect.bisect_left(names, prefix)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return range(start, end)
+
+
+ingredient_index = IngredientIndex()
@@ -1,8 +1,9 @@
-import base64
+from collections import Counter
 
 from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 
 from recipes.models import (
     Ingredient,
@@ -10,15 +11,19 @@ from recipes.models import (
     Recipe,
     Tag,
 )
+from recipes import shopping_list
 from users.models import User
-from .utils import is_subscribed
-from .fields import Base64ImageField
+from .utils import get_viewer_state
+from .fields import Base64ImageField, decode_base64_image
+from .images import get_variant_urls
 from foodgram.settings import MIN_VALUE, MAX_VALUE
 
 
 class CustomUserSerializer(UserSerializer):
 
     avatar = Base64ImageField(required=False)
+    avatar_variants = serializers.SerializerMethodField()
+    avatar_status = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed'
     )
@@ -32,6 +37,8 @@ class CustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_variants',
+            'avatar_status',
             'is_subscribed',
         )
 
@@ -39,23 +46,31 @@ class CustomUserSerializer(UserSerializer):
 
         avatar_data = validated_data.pop('avatar', None)
         if avatar_data:
-            format, imgstr = avatar_data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name=f'avatar.{ext}')
-            instance.avatar.save(f'avatar.{ext}', data, save=True)
+            data = decode_base64_image(avatar_data, 'avatar')
+            instance.avatar.save(data.name, data, save=True)
         if not avatar_data:
             raise serializers.ValidationError('Добавьте поле аватар.')
 
         return super().update(instance, validated_data)
 
+    def get_avatar_variants(self, obj):
+        return get_variant_urls(
+            obj.avatar, obj.avatar_variants, self.context.get('request')
+        )
+
+    def get_avatar_status(self, obj):
+        return obj.avatar_variants.get('status')
+
     def delete_avatar(self):
         user = self.instance
-        user.avatar.delete()
+        # Файл удалится, когда на него не останется ссылок.
+        user.avatar = None
         user.save()
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return is_subscribed(request.user, obj)
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_viewer_state(self).is_subscribed(obj)
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -103,15 +118,19 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return data
 
     def get_is_subscribed(self, obj):
-        request = self.context['request']
-        return is_subscribed(request.user, obj)
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_viewer_state(self).is_subscribed(obj)
 
     def get_recipes(self, obj):
-        request = self.context['request']
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[: int(limit)]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            request = self.context['request']
+            limit = request.GET.get('recipes_limit')
+            recipes = obj.recipes.all()
+            if limit:
+                recipes = recipes[: int(limit)]
         serializer = ShoppingCartRecipeSerializer(
             recipes,
             many=True,
@@ -120,6 +139,8 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return serializer.data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
@@ -127,14 +148,14 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ('id', 'name', 'slug')
 
 
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class RecipeIngredientsSerializer(serializers.ModelSerializer):
@@ -159,6 +180,8 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         source='recipe_ingredients'
     )
     image = Base64ImageField()
+    image_variants = serializers.SerializerMethodField()
+    image_status = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -166,20 +189,34 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'name', 'image',
-            'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart'
+            'image_variants', 'image_status', 'text', 'cooking_time',
+            'is_favorited', 'is_in_shopping_cart'
         )
 
+    def to_representation(self, instance):
+        # Флаг подписки вычислен в запросе вьюсета, переносим его на автора,
+        # чтобы CustomUserSerializer не делал отдельный запрос.
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
+    def get_image_variants(self, obj):
+        return get_variant_urls(
+            obj.image, obj.image_variants, self.context.get('request')
+        )
+
+    def get_image_status(self, obj):
+        return obj.image_variants.get('status')
+
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.favorite.filter(author=user).exists()
-        return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return get_viewer_state(self).is_favorited(obj)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return user.shopping_cart.filter(recipe=obj).exists()
-        return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return get_viewer_state(self).is_in_shopping_cart(obj)
 
 
 class IngredientsAmountSerializer(serializers.ModelSerializer):
@@ -201,10 +238,7 @@ class IngredientsAmountSerializer(serializers.ModelSerializer):
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
 
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientsAmountSerializer(many=True)
     image = Base64ImageField()
@@ -224,54 +258,65 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             'image', 'text', 'cooking_time'
         )
 
-    def validate_ingredients_and_tags(self, ingredients, tags):
-        if not ingredients:
-            raise serializers.ValidationError('Рецепт без ингредиентов.')
-
-        if not tags:
-            raise serializers.ValidationError('Рецепт без Тегов.')
-
-        ingredient_ids = set()
-        tag_names = set()
+    def validate(self, data):
+        errors = {}
+        if 'ingredients' in data or not self.partial:
+            ingredient_errors = self.validate_ingredients_data(
+                data.get('ingredients')
+            )
+            if ingredient_errors:
+                errors['ingredients'] = ingredient_errors
+        if 'tags' in data or not self.partial:
+            tag_errors = self.validate_tags_data(data)
+            if tag_errors:
+                errors['tags'] = tag_errors
+        if errors:
+            raise serializers.ValidationError(errors)
+        return data
 
-        # Объединенный цикл для проверки ингредиентов и тегов
+    def validate_ingredients_data(self, ingredients):
+        if not ingredients:
+            return ['Рецепт без ингредиентов.']
+
+        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
+        # Один запрос на все ингредиенты, найденные объекты используются
+        # при создании RecipeIngredient.
+        found = Ingredient.objects.in_bulk(ingredient_ids)
+        errors = [
+            f'Ингредиент {ingredient_id} не существует.'
+            for ingredient_id in dict.fromkeys(ingredient_ids)
+            if ingredient_id not in found
+        ]
+        errors += [
+            f'Ингредиент с ID {ingredient_id} уже добавлен.'
+            for ingredient_id, count in Counter(ingredient_ids).items()
+            if count > 1
+        ]
         for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-
-            # Проверка существования ингредиента
-            if not Ingredient.objects.filter(id=ingredient_id).exists():
-                raise serializers.ValidationError(
-                    f'Ингредиент {ingredient_id} не существует.'
-                )
-
-            # Проверка на дубликаты ингредиентов
-            if ingredient_id in ingredient_ids:
-                raise serializers.ValidationError(
-                    f'Ингредиент с ID {ingredient_id} уже добавлен.'
-                )
-            ingredient_ids.add(ingredient_id)
-
-        for tag in tags:
-            # Проверка существования тега
-            if not Tag.objects.filter(name=tag).exists():
-                raise serializers.ValidationError(
-                    f'Данного тэга {tag} нет в списке доступных.'
-                )
-
-            # Проверка на дубликаты тегов
-            if tag in tag_names:
-                raise serializers.ValidationError(
-                    'Повторяющих тегов не должно быть.'
-                )
-            tag_names.add(tag)
-
-        return ingredients, tags
+            ingredient['ingredient'] = found.get(ingredient['id'])
+        return errors
+
+    def validate_tags_data(self, data):
+        tag_ids = data.get('tags')
+        if not tag_ids:
+            return ['Рецепт без Тегов.']
+
+        found = Tag.objects.in_bulk(tag_ids)
+        errors = [
+            f'Данного тэга {tag_id} нет в списке доступных.'
+            for tag_id in dict.fromkeys(tag_ids)
+            if tag_id not in found
+        ]
+        if len(set(tag_ids)) != len(tag_ids):
+            errors.append('Повторяющих тегов не должно быть.')
+        data['tags'] = [found[tag_id] for tag_id in tag_ids if tag_id in found]
+        return errors
 
     def add_recipe_ingredients(self, ingredients, recipe):
         recipe_ingredients = [
             RecipeIngredient(
                 recipe=recipe,
-                ingredient_id=ingredient['id'],
+                ingredient=ingredient['ingredient'],
                 amount=ingredient['amount']
             )
             for ingredient in ingredients
@@ -288,21 +333,74 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    def update_recipe_ingredients(self, ingredients, recipe):
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe
+            )
+        }
+        submitted = {
+            ingredient['id']: ingredient for ingredient in ingredients
+        }
+        changes = {}
+        removed = []
+        changed = []
+        for ingredient_id, recipe_ingredient in existing.items():
+            if ingredient_id not in submitted:
+                changes[ingredient_id] = -recipe_ingredient.amount
+                removed.append(recipe_ingredient.id)
+                continue
+            amount = submitted[ingredient_id]['amount']
+            if amount != recipe_ingredient.amount:
+                changes[ingredient_id] = amount - recipe_ingredient.amount
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        added = [
+            ingredient for ingredient_id, ingredient in submitted.items()
+            if ingredient_id not in existing
+        ]
+        for ingredient in added:
+            changes[ingredient['id']] = ingredient['amount']
+
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self.add_recipe_ingredients(added, recipe)
+        shopping_list.change_recipe(recipe, changes)
+
+    def update_recipe_tags(self, tags, recipe):
+        existing = set(recipe.tags.values_list('id', flat=True))
+        submitted = {tag.id for tag in tags}
+        if existing - submitted:
+            recipe.tags.remove(*(existing - submitted))
+        if submitted - existing:
+            recipe.tags.add(*(submitted - existing))
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients_data = validated_data.pop('ingredients', None)
 
         instance = super().update(instance, validated_data)
 
-        instance.ingredients.clear()
-        self.add_recipe_ingredients(ingredients_data, instance)
-
-        instance.tags.clear()
-        instance.tags.set(tags)
+        # При частичном обновлении пропущенные связи не трогаем.
+        if ingredients_data is not None:
+            self.update_recipe_ingredients(ingredients_data, instance)
+        if tags is not None:
+            self.update_recipe_tags(tags, instance)
 
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
         return RecipeGetSerializer(
             instance, context={'request': self.context.get('request')}
         ).data
@@ -311,7 +409,13 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 class ShoppingCartRecipeSerializer(serializers.ModelSerializer):
 
     image = Base64ImageField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+    def get_image_variants(self, obj):
+        return get_variant_urls(
+            obj.image, obj.image_variants, self.context.get('request')
+        )
@@ -0,0 +1,88 @@
+"""Обратимое кодирование id рецепта в короткий код ссылки.
+
+Тело кода — биективная перестановка id в base62, последний символ —
+контрольный и не бывает шестнадцатеричной цифрой, поэтому новые коды
+не пересекаются с прежними MD5-кодами из Recipe.legacy_short_code.
+"""
+import string
+
+from django.conf import settings
+
+ALPHABET = string.digits + string.ascii_lowercase + string.ascii_uppercase
+CHECK_ALPHABET = string.ascii_lowercase[6:] + string.ascii_uppercase
+BASE = len(ALPHABET)
+MIN_BODY_LENGTH = 5
+MAX_BODY_LENGTH = 11
+# Простое число, взаимно простое с 62 при любой длине кода.
+MULTIPLIER = 2654435761
+
+_INDEX = {char: index for index, char in enumerate(ALPHABET)}
+
+
+def _body_length(value):
+    length = MIN_BODY_LENGTH
+    while value >= BASE ** length:
+        length += 1
+    return length
+
+
+def _to_digits(value, length):
+    digits = []
+    for _ in range(length):
+        value, digit = divmod(value, BASE)
+        digits.append(digit)
+    return digits[::-1]
+
+
+def _from_digits(digits):
+    value = 0
+    for digit in digits:
+        value = value * BASE + digit
+    return value
+
+
+def _check_char(digits):
+    checksum = sum(
+        (position + 1) * digit for position, digit in enumerate(digits)
+    )
+    return CHECK_ALPHABET[checksum % len(CHECK_ALPHABET)]
+
+
+def _permute(value, length):
+    modulus = BASE ** length
+    offset = settings.SHORT_LINK_SALT % modulus
+    value = (MULTIPLIER * value + offset) % modulus
+    value = _from_digits(_to_digits(value, length)[::-1])
+    return (MULTIPLIER * value + offset) % modulus
+
+
+def _unpermute(value, length):
+    modulus = BASE ** length
+    offset = settings.SHORT_LINK_SALT % modulus
+    inverse = pow(MULTIPLIER, -1, modulus)
+    value = (value - offset) * inverse % modulus
+    value = _from_digits(_to_digits(value, length)[::-1])
+    return (value - offset) * inverse % modulus
+
+
+def encode(recipe_id):
+    """Возвращает короткий код для id рецепта."""
+    length = _body_length(recipe_id)
+    digits = _to_digits(_permute(recipe_id, length), length)
+    return ''.join(ALPHABET[digit] for digit in digits) + _check_char(digits)
+
+
+def decode(code):
+    """Возвращает id рецепта или None, если код не выдавался encode()."""
+    body, check = code[:-1], code[-1:]
+    if not MIN_BODY_LENGTH <= len(body) <= MAX_BODY_LENGTH:
+        return None
+    if any(char not in _INDEX for char in body):
+        return None
+    digits = [_INDEX[char] for char in body]
+    if check != _check_char(digits):
+        return None
+    recipe_id = _unpermute(_from_digits(digits), len(body))
+    if not recipe_id or _body_length(recipe_id) != len(body):
+        return None
+    return recipe_id
@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from recipes import shopping_list
+from recipes.models import Ingredient, Recipe, ShoppingCart
+from users.models import User
+from . import media, shortcodes, tasks
+from .images import AVATAR_VARIANTS, RECIPE_IMAGE_VARIANTS, generate_variants
+from .cache import short_link_cache
+from .search import ingredient_index
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_new_recipe_short_link(sender, instance, created, **kwargs):
+    # Код мог попасть в кэш как несуществующий до создания рецепта.
+    if created:
+        short_link_cache.delete(shortcodes.encode(instance.id))
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_short_link(sender, instance, **kwargs):
+    codes = [shortcodes.encode(instance.id)]
+    if instance.legacy_short_code:
+        codes.append(instance.legacy_short_code)
+    short_link_cache.delete(*codes)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    shopping_list.delete_recipe(instance)
+
+
+@receiver(post_init, sender=ShoppingCart)
+def remember_shopping_cart_item(sender, instance, **kwargs):
+    instance._shopping_list_key = (instance.author_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(sender, instance, created, **kwargs):
+    key = (instance.author_id, instance.recipe_id)
+    if not created and key == instance._shopping_list_key:
+        return
+    if not created:
+        # Запись корзины изменили, например в админке.
+        shopping_list.remove_recipe(*instance._shopping_list_key)
+    shopping_list.add_recipe(*key)
+    instance._shopping_list_key = key
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(sender, instance, origin=None,
+                                     **kwargs):
+    # При удалении рецепта список уже обновлён в pre_delete, а список
+    # удаляемого пользователя удаляется вместе с ним.
+    if isinstance(origin, ShoppingCart) or getattr(
+        origin, 'model', None
+    ) is ShoppingCart:
+        shopping_list.remove_recipe(*instance._shopping_list_key)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+def get_ready_variants(instance, field_name, variants_name):
+    # Файлы с одинаковым содержимым совпадают, поэтому готовые варианты
+    # другого объекта с тем же файлом можно использовать без обработки.
+    return type(instance).objects.filter(**{
+        field_name: getattr(instance, field_name).name,
+        f'{variants_name}__status': 'ready',
+    }).exclude(pk=instance.pk).values_list(variants_name, flat=True).first()
+
+
+def update_image_variants(instance, field_name, variants_name, variants):
+    field_file = getattr(instance, field_name)
+    current = getattr(instance, variants_name)
+    if not field_file:
+        new_variants = {}
+    elif current.get('source') == field_file.name and not (
+        # Полное сохранение устаревшей копии объекта могло затереть
+        # результат обработчика очереди.
+        current.get('status') == 'pending'
+        and not tasks.is_queued(instance, field_name)
+    ):
+        return
+    else:
+        new_variants = get_ready_variants(instance, field_name, variants_name)
+    if new_variants is None and settings.IMAGE_PROCESSING_ASYNC:
+        tasks.enqueue(instance, field_name)
+        return
+    if new_variants is None:
+        new_variants = generate_variants(field_file, variants)
+    if new_variants != current:
+        setattr(instance, variants_name, new_variants)
+        tasks.save_variants(
+            type(instance).objects.filter(pk=instance.pk),
+            variants_name,
+            new_variants,
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_image_variants(sender, instance, **kwargs):
+    update_image_variants(
+        instance, 'image', 'image_variants', RECIPE_IMAGE_VARIANTS
+    )
+
+
+@receiver(post_save, sender=User)
+def update_avatar_variants(sender, instance, **kwargs):
+    update_image_variants(
+        instance, 'avatar', 'avatar_variants', AVATAR_VARIANTS
+    )
+
+
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=User)
+def remember_media_names(sender, instance, **kwargs):
+    media.remember_names(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def update_media_references(sender, instance, update_fields=None, **kwargs):
+    media.update_references(instance, update_fields)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def release_media_references(sender, instance, **kwargs):
+    media.release_references(instance)
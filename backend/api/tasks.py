@@ -0,0 +1,128 @@
+"""Очередь обработки изображений в базе данных.
+
+Запрос только сохраняет файл и ставит задачу, а декодирование и
+нарезку вариантов выполняет команда process_images.
+"""
+import logging
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import ImageTask
+from .images import IMAGE_FIELDS, generate_variants, pending_variants
+
+logger = logging.getLogger(__name__)
+
+
+def save_variants(queryset, variants_name, variants):
+    values = {variants_name: variants}
+    # Варианты входят в ответ API и меняют версию объекта для ETag.
+    if any(
+        field.name == 'updated_at' for field in queryset.model._meta.fields
+    ):
+        values['updated_at'] = timezone.now()
+    return queryset.update(**values)
+
+
+def enqueue(instance, field_name):
+    """Помечает варианты изображения как ожидающие и ставит задачу."""
+    field_file = getattr(instance, field_name)
+    variants_name, _ = IMAGE_FIELDS[
+        (instance._meta.label_lower, field_name)
+    ]
+    variants = pending_variants(field_file)
+    setattr(instance, variants_name, variants)
+    save_variants(
+        type(instance).objects.filter(pk=instance.pk), variants_name, variants
+    )
+    # Задачи для прежних файлов этого поля больше не нужны.
+    ImageTask.objects.filter(
+        model_label=instance._meta.label_lower,
+        object_id=instance.pk,
+        field_name=field_name,
+        status=ImageTask.PENDING,
+    ).delete()
+    return ImageTask.objects.create(
+        model_label=instance._meta.label_lower,
+        object_id=instance.pk,
+        field_name=field_name,
+        source=field_file.name,
+    )
+
+
+def is_queued(instance, field_name):
+    return ImageTask.objects.filter(
+        model_label=instance._meta.label_lower,
+        object_id=instance.pk,
+        field_name=field_name,
+        source=getattr(instance, field_name).name,
+        status__in=(ImageTask.PENDING, ImageTask.PROCESSING),
+    ).exists()
+
+
+def claim_tasks(batch_size):
+    """Забирает пачку задач; параллельные обработчики их не получат."""
+    with transaction.atomic():
+        task_ids = list(
+            ImageTask.objects.filter(status=ImageTask.PENDING)
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        ImageTask.objects.filter(id__in=task_ids).update(
+            status=ImageTask.PROCESSING,
+            attempts=F('attempts') + 1,
+            updated_at=timezone.now(),
+        )
+    return task_ids
+
+
+def requeue_stalled(timeout):
+    """Возвращает в очередь задачи упавших обработчиков."""
+    stalled = ImageTask.objects.filter(
+        status=ImageTask.PROCESSING,
+        updated_at__lt=timezone.now() - timedelta(seconds=timeout),
+    )
+    failed = stalled.filter(
+        attempts__gte=settings.IMAGE_TASK_MAX_ATTEMPTS
+    ).update(status=ImageTask.FAILED, error='Превышено число попыток.')
+    return failed, stalled.update(status=ImageTask.PENDING)
+
+
+def process_image_task(task_id):
+    """Строит варианты изображения; вызывается в процессе пула."""
+    task = ImageTask.objects.filter(
+        id=task_id, status=ImageTask.PROCESSING
+    ).first()
+    if task is None:
+        return None
+    variants_name, variants = IMAGE_FIELDS[
+        (task.model_label, task.field_name)
+    ]
+    model = apps.get_model(task.model_label)
+    instance = model.objects.filter(
+        pk=task.object_id, **{task.field_name: task.source}
+    ).first()
+    if instance is None:
+        # Объект удалён или изображение уже заменено.
+        task.status = ImageTask.DONE
+        task.save(update_fields=('status', 'updated_at'))
+        return task.status
+    result = generate_variants(getattr(instance, task.field_name), variants)
+    save_variants(
+        model.objects.filter(
+            pk=task.object_id, **{task.field_name: task.source}
+        ),
+        variants_name,
+        result,
+    )
+    if result['status'] == 'ready':
+        task.status = ImageTask.DONE
+    else:
+        task.status = ImageTask.FAILED
+        task.error = 'Файл не является изображением или повреждён.'
+    task.save(update_fields=('status', 'error', 'updated_at'))
+    return task.status
@@ -0,0 +1,583 @@
+import base64
+import json
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.test import APIClient
+
+from api.cache import short_link_cache
+from api.fields import Base64ImageField
+from api.parsers import FastJSONParser
+from recipes import shopping_list
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    MediaBlob,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+from users.models import Subscription, User
+
+
+def create_recipes(author, count, tags, ingredients):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {index:03}',
+            image='recipes/test.png',
+            text='Описание',
+            cooking_time=index + 1,
+        )
+        for index in range(count)
+    )
+    for index, recipe in enumerate(recipes):
+        recipe.tags.set(tags[: 1 + index % len(tags)])
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for recipe in recipes
+        for amount, ingredient in enumerate(
+            ingredients[: 1 + recipe.cooking_time % len(ingredients)], 1
+        )
+    )
+    return recipes
+
+
+def image_bytes(color):
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def image_data(color):
+    return 'data:image/png;base64,' + base64.b64encode(
+        image_bytes(color)
+    ).decode()
+
+
+def use_temp_media(test):
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    media = override_settings(MEDIA_ROOT=media_root)
+    media.enable()
+    test.addCleanup(media.disable)
+
+
+class APITestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password',
+        )
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{index}@example.com',
+                username=f'author{index}',
+                first_name='Имя',
+                last_name='Фамилия',
+                password='password',
+            )
+            for index in range(3)
+        ]
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(5)
+        ]
+        for author in cls.authors:
+            create_recipes(author, 10, cls.tags, cls.ingredients)
+        Subscription.objects.create(user=cls.user, author=cls.authors[0])
+
+    def setUp(self):
+        # Кэшированные количества и справочники меняют число запросов.
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class RecipeListQueriesTest(APITestCase):
+
+    def assert_constant_queries(self, client, queries):
+        for limit in (2, 6, 20):
+            cache.clear()
+            with self.assertNumQueries(queries):
+                response = client.get('/api/recipes/', {'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), limit)
+
+    def test_anonymous(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), override_settings(
+                FAST_READ_SERIALIZERS=fast
+            ):
+                self.assert_constant_queries(self.anonymous, 4)
+
+    def test_authenticated(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), override_settings(
+                FAST_READ_SERIALIZERS=fast
+            ):
+                self.assert_constant_queries(self.client, 4)
+
+
+class PaginationCountTest(APITestCase):
+
+    def count_queries(self, client, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return sum(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        )
+
+    def test_count_shared_between_users(self):
+        other = APIClient()
+        other.force_authenticate(self.authors[0])
+        for params in ({}, {'tags': ['tag1', 'tag2'], 'limit': 3}):
+            with self.subTest(params=params):
+                self.assertEqual(self.count_queries(self.client, params), 1)
+                self.assertEqual(self.count_queries(other, params), 0)
+                self.assertEqual(self.count_queries(self.anonymous, params), 0)
+
+    def test_user_filters_counted_separately(self):
+        Favorite.objects.create(
+            author=self.user, recipe=Recipe.objects.first()
+        )
+        other = APIClient()
+        other.force_authenticate(self.authors[0])
+        params = {'is_favorited': 1}
+        self.assertEqual(self.count_queries(self.client, params), 1)
+        self.assertEqual(self.count_queries(other, params), 1)
+
+
+class RecipeCursorTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.authors[0],
+                name='Рецепт 005',
+                image='recipes/test.png',
+                text='Описание',
+                cooking_time=1,
+            )
+            for _ in range(20)
+        )
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any(
+                'OFFSET' in query['sql'] for query in queries.captured_queries
+            ))
+            page = response.json()
+            ids.append([recipe['id'] for recipe in page['results']])
+            url = page[link]
+        return ids
+
+    def test_duplicate_names(self):
+        expected = list(
+            Recipe.objects.order_by('name', 'id').values_list('id', flat=True)
+        )
+        pages = self.walk('/api/recipes/?cursor=&limit=4', 'next')
+        self.assertEqual(sum(pages, []), expected)
+        self.assertTrue(all(len(page) == 4 for page in pages[:-1]))
+        last = self.client.get(
+            '/api/recipes/', {'cursor': '', 'limit': 4}
+        ).json()
+        while last['next']:
+            last = self.client.get(last['next']).json()
+        backward = self.walk(last['previous'], 'previous')
+        self.assertEqual(backward, pages[-2::-1])
+
+    def test_invalid_cursor(self):
+        for cursor in ('bad', 'cD0x', 'cD0lNUIlNUQ='):
+            response = self.client.get('/api/recipes/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+class ShoppingListTest(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = list(Recipe.objects.order_by('id')[:3])
+
+    def assert_list_consistent(self):
+        self.assertEqual(shopping_list.verify(), {})
+
+    def test_api_add_and_remove(self):
+        url = f'/api/recipes/{self.recipes[0].id}/shopping_cart/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertTrue(ShoppingListItem.objects.filter(author=self.user))
+        self.assert_list_consistent()
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(ShoppingListItem.objects.filter(author=self.user))
+
+    def test_direct_changes(self):
+        # Так же меняют корзину админка и shell.
+        cart = ShoppingCart.objects.create(
+            author=self.user, recipe=self.recipes[0]
+        )
+        ShoppingCart.objects.create(author=self.user, recipe=self.recipes[1])
+        self.assert_list_consistent()
+        cart.recipe = self.recipes[2]
+        cart.save()
+        self.assert_list_consistent()
+        ShoppingCart.objects.filter(recipe=self.recipes[1]).delete()
+        self.assert_list_consistent()
+
+    def test_recipe_and_user_deletion(self):
+        for recipe in self.recipes:
+            ShoppingCart.objects.create(author=self.user, recipe=recipe)
+            ShoppingCart.objects.create(author=self.authors[1], recipe=recipe)
+        self.recipes[0].delete()
+        self.assert_list_consistent()
+        self.authors[1].delete()
+        self.assert_list_consistent()
+
+
+class CreateRecipeTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.many_ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {index}', measurement_unit='шт'
+            )
+            for index in range(40)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        use_temp_media(self)
+
+    def get_payload(self, ingredients, tags, color=(200, 100, 50)):
+        return {
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in ingredients
+            ],
+            'tags': tags,
+            'image': image_data(color),
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+        }
+
+    def create(self, payload):
+        return self.client.post('/api/recipes/', payload, format='json')
+
+    def test_constant_queries(self):
+        tags = [tag.id for tag in self.tags]
+        # Разные изображения, чтобы файл каждый раз записывался заново.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.create(self.get_payload(
+                [self.many_ingredients[0].id], tags, (1, 2, 3)
+            ))
+        self.assertEqual(response.status_code, 201)
+        with self.assertNumQueries(len(queries)):
+            response = self.create(self.get_payload(
+                [ingredient.id for ingredient in self.many_ingredients],
+                tags,
+                (4, 5, 6),
+            ))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['ingredients']), 40)
+
+    def test_missing_and_duplicate_ids(self):
+        ingredient_id = self.ingredients[0].id
+        tag_id = self.tags[0].id
+        response = self.create(self.get_payload(
+            [ingredient_id, 9998, ingredient_id, 9999],
+            [tag_id, 9999, tag_id],
+        ))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'ingredients': [
+                'Ингредиент 9998 не существует.',
+                'Ингредиент 9999 не существует.',
+                f'Ингредиент с ID {ingredient_id} уже добавлен.',
+            ],
+            'tags': [
+                'Данного тэга 9999 нет в списке доступных.',
+                'Повторяющих тегов не должно быть.',
+            ],
+        })
+
+    def test_empty_lists(self):
+        response = self.create(self.get_payload([], []))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'ingredients': ['Рецепт без ингредиентов.'],
+            'tags': ['Рецепт без Тегов.'],
+        })
+
+
+class MediaReferenceTest(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        use_temp_media(self)
+
+    def create(self):
+        response = self.client.post('/api/recipes/', {
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+            'tags': [self.tags[0].id],
+            'image': image_data((10, 20, 30)),
+            'name': 'Рецепт с фото',
+            'text': 'Описание',
+            'cooking_time': 5,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Recipe.objects.get(pk=response.json()['id'])
+
+    def assert_refcount(self, name, refcount):
+        self.assertEqual(
+            MediaBlob.objects.get(name=name).refcount, refcount
+        )
+
+    def test_upload_during_pending_deletion(self):
+        first = self.create()
+        name = first.image.name
+        self.create().delete()
+        self.assert_refcount(name, 1)
+        # Повторная загрузка того же файла в тот же рецепт.
+        first.image.save('photo.png', ContentFile(image_bytes((10, 20, 30))))
+        self.assert_refcount(name, 1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+            self.assert_refcount(name, 0)
+            # Загрузка того же файла до удаления файлов без ссылок.
+            third = self.create()
+        for callback in callbacks:
+            callback()
+        self.assert_refcount(name, 1)
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            third.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(default_storage.exists(name))
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=True)
+class AsyncImageUploadTest(TestCase):
+
+    def test_file_upload_signature(self):
+        field = Base64ImageField()
+        upload = SimpleUploadedFile('image.png', image_bytes((1, 2, 3)))
+        self.assertIs(field.run_validation(upload), upload)
+        with self.assertRaises(ValidationError):
+            field.run_validation(
+                SimpleUploadedFile('image.png', b'<html>not an image')
+            )
+        with self.assertRaises(ValidationError):
+            field.run_validation(
+                SimpleUploadedFile('image.svg', b'<svg></svg>')
+            )
+
+
+class CatalogueVersionTest(APITestCase):
+
+    def get_etag(self, url):
+        response = self.anonymous.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_etag_follows_data(self):
+        etag = self.get_etag('/api/tags/')
+        # Версия не зависит от содержимого кэша и процесса.
+        cache.clear()
+        response = self.anonymous.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        tag = Tag.objects.create(name='Новый', slug='new')
+        self.assertNotEqual(self.get_etag('/api/tags/'), etag)
+        self.assertContains(self.anonymous.get('/api/tags/'), 'new')
+        etag = self.get_etag('/api/tags/')
+        tag.delete()
+        self.assertNotEqual(self.get_etag('/api/tags/'), etag)
+
+    def test_bulk_created_ingredients(self):
+        etag = self.get_etag('/api/ingredients/')
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Соль', measurement_unit='г')]
+        )
+        self.assertNotEqual(self.get_etag('/api/ingredients/'), etag)
+        self.assertContains(self.anonymous.get('/api/ingredients/'), 'Соль')
+
+    def test_recipe_etag(self):
+        recipe = Recipe.objects.filter(tags=self.tags[0]).first()
+        url = f'/api/recipes/{recipe.id}/'
+        etag = self.get_etag(url)
+        cache.clear()
+        self.assertEqual(self.get_etag(url), etag)
+        self.tags[0].name = 'Переименован'
+        self.tags[0].save()
+        self.assertNotEqual(self.get_etag(url), etag)
+        self.assertContains(self.anonymous.get(url), 'Переименован')
+
+
+class FastJSONParserTest(SimpleTestCase):
+
+    def test_matches_drf_parser(self):
+        for body in (
+            b'{"id": 1, "amount": 1.5, "name": "\\u0441\\u043e\\u043b"}',
+            b'{"a": 123456789012345678901234567890}',
+            b'[18446744073709551616, -9223372036854775809, 1e300]',
+            b'[-1.5E+19, 0.5]',
+            b'{"text": "5e 1234567890123456789", "n": 9223372036854775807}',
+        ):
+            with self.subTest(body=body):
+                data = FastJSONParser().parse(BytesIO(body))
+                self.assertEqual(
+                    repr(data), repr(JSONParser().parse(BytesIO(body)))
+                )
+
+
+class FastReadParityTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        author = cls.authors[1]
+        author.avatar = 'users/аватар автора.png'
+        author.avatar_variants = {
+            'source': author.avatar.name,
+            'status': 'ready',
+            'files': {'avatar': {'webp': 'users/variants/a_avatar.webp'}},
+        }
+        User.objects.filter(pk=author.pk).update(
+            avatar=author.avatar.name, avatar_variants=author.avatar_variants
+        )
+        recipes = list(Recipe.objects.order_by('id'))
+        Recipe.objects.filter(pk=recipes[0].pk).update(image_variants={
+            'source': 'recipes/test.png',
+            'status': 'ready',
+            'files': {
+                'card': {
+                    'webp': 'recipes/variants/test_card.webp',
+                    'avif': 'recipes/variants/test_card.avif',
+                },
+            },
+        })
+        Recipe.objects.filter(pk=recipes[1].pk).update(
+            image_variants={'status': 'pending', 'files': {}}
+        )
+        for author in cls.authors[1:]:
+            Subscription.objects.create(user=cls.user, author=author)
+        for recipe in recipes[::3]:
+            ShoppingCart.objects.create(author=cls.user, recipe=recipe)
+        for recipe in recipes[::4]:
+            Favorite.objects.create(author=cls.user, recipe=recipe)
+
+    def get_content(self, client, url, fast):
+        cache.clear()
+        with override_settings(FAST_READ_SERIALIZERS=fast):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def assert_same_bytes(self, client, url):
+        with self.subTest(url=url):
+            content = self.get_content(client, url, False)
+            self.assertEqual(self.get_content(client, url, True), content)
+        return content
+
+    def test_recipes(self):
+        urls = [
+            '/api/recipes/',
+            '/api/recipes/?page=2&limit=7',
+            f'/api/recipes/?author={self.authors[1].id}',
+            '/api/recipes/?tags=tag1&tags=tag2',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1&limit=50',
+        ]
+        for client in (self.client, self.anonymous):
+            for url in urls:
+                self.assert_same_bytes(client, url)
+
+    def test_recipe_cursor_pages(self):
+        url = '/api/recipes/?cursor=&limit=4'
+        for _ in range(3):
+            url = json.loads(self.assert_same_bytes(self.client, url))['next']
+
+    def test_subscriptions(self):
+        for url in (
+            '/api/users/subscriptions/',
+            '/api/users/subscriptions/?recipes_limit=2',
+            '/api/users/subscriptions/?cursor=&limit=2&recipes_limit=3',
+        ):
+            self.assert_same_bytes(self.client, url)
+
+
+class ShortLinkStatsTest(APITestCase):
+
+    def test_admin_only(self):
+        url = '/api/short-links/stats/'
+        self.assertEqual(self.anonymous.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', is_staff=True
+        )
+        self.client.force_authenticate(admin)
+        short_link_cache.local.clear()
+        before = self.client.get(url).json()
+        recipe = Recipe.objects.first()
+        code = self.client.get(
+            f'/api/recipes/{recipe.id}/get-link/'
+        ).json()['short-link'].rstrip('/').rpartition('/')[2]
+        self.client.get(f'/s/{code}/')
+        self.client.get(f'/s/{code}/')
+        after = self.client.get(url).json()
+        self.assertEqual(after['misses'], before['misses'] + 1)
+        self.assertEqual(after['local_hits'], before['local_hits'] + 1)
+
+
+class IngredientSearchTest(APITestCase):
+
+    def test_index_follows_catalogue_version(self):
+        url = '/api/ingredients/?name=со'
+        self.assertEqual(self.anonymous.get(url).json(), [])
+        # bulk_create не отправляет сигналов, как load_ingredients.
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Соль', measurement_unit='г')]
+        )
+        response = self.anonymous.get(url)
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.json()], ['Соль']
+        )
+        response = self.anonymous.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
@@ -6,6 +6,7 @@ from .views import (
     IngredientViewSet,
     RecipeViewSet,
     TagViewSet,
+    short_link_stats,
 )
 
 
@@ -20,6 +21,9 @@ router.register('users', CustomUserViewSet, basename='users')
 
 
 urlpatterns = [
+    path(
+        'short-links/stats/', short_link_stats, name='short_link_stats'
+    ),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,6 +1,12 @@
-import hashlib
+from collections import defaultdict
 
-SHORT_LINK_LENGTH = 6
+from django.db.models import F, QuerySet, Window
+from django.db.models.functions import RowNumber
+from django.db.models.manager import BaseManager
+from django.utils.functional import cached_property
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
 
 
 def is_subscribed(user, author):
@@ -9,5 +15,101 @@ def is_subscribed(user, author):
     return user.subscriptions.filter(author=author).exists()
 
 
-def generate_short_link_code(recipe_id):
-    return hashlib.md5(str(recipe_id).encode()).hexdigest()[:SHORT_LINK_LENGTH]
+class ViewerState:
+    """Избранное, корзина и подписки текущего пользователя.
+
+    Id загружаются одним запросом на каждый набор и только для объектов
+    ответа; для прочих объектов выполняется отдельный запрос.
+    """
+
+    def __init__(self, user, objects=()):
+        self.user = user
+        self.recipe_ids = set()
+        self.author_ids = set()
+        for obj in objects:
+            if isinstance(obj, Recipe):
+                self.recipe_ids.add(obj.pk)
+                self.author_ids.add(obj.author_id)
+            elif isinstance(obj, User):
+                self.author_ids.add(obj.pk)
+
+    @cached_property
+    def favorited(self):
+        return set(Favorite.objects.filter(
+            author=self.user, recipe_id__in=self.recipe_ids
+        ).values_list('recipe_id', flat=True))
+
+    @cached_property
+    def in_shopping_cart(self):
+        return set(ShoppingCart.objects.filter(
+            author=self.user, recipe_id__in=self.recipe_ids
+        ).values_list('recipe_id', flat=True))
+
+    @cached_property
+    def subscribed(self):
+        return set(Subscription.objects.filter(
+            user=self.user, author_id__in=self.author_ids
+        ).values_list('author_id', flat=True))
+
+    def is_favorited(self, recipe):
+        if self.user.is_anonymous:
+            return False
+        if recipe.pk in self.recipe_ids:
+            return recipe.pk in self.favorited
+        return self.user.favorite.filter(recipe=recipe).exists()
+
+    def is_in_shopping_cart(self, recipe):
+        if self.user.is_anonymous:
+            return False
+        if recipe.pk in self.recipe_ids:
+            return recipe.pk in self.in_shopping_cart
+        return self.user.shopping_cart.filter(recipe=recipe).exists()
+
+    def is_subscribed(self, author):
+        if self.user.is_anonymous:
+            return False
+        if author.pk in self.author_ids:
+            return author.pk in self.subscribed
+        return is_subscribed(self.user, author)
+
+
+def get_viewer_state(serializer):
+    """Состояние для всех объектов, которые выводит корневой сериализатор."""
+    context = serializer.context
+    if 'viewer_state' not in context:
+        instance = serializer.root.instance
+        if isinstance(instance, BaseManager):
+            objects = ()
+        elif isinstance(instance, (list, tuple, QuerySet)):
+            # Список уже загружен сериализатором, повторного запроса нет.
+            objects = instance
+        else:
+            objects = (instance,)
+        context['viewer_state'] = ViewerState(
+            context['request'].user, objects
+        )
+    return context['viewer_state']
+
+
+def get_author_recipes(authors, limit=None):
+    recipes = Recipe.objects.filter(author__in=authors).order_by('name', 'id')
+    if limit:
+        recipes = recipes.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('name').asc(), F('id').asc()),
+            )
+        ).filter(row_number__lte=int(limit))
+    return recipes
+
+
+def attach_author_recipes(authors, limit=None):
+    recipes = get_author_recipes(authors, limit).only(
+        'id', 'name', 'image', 'image_variants', 'cooking_time', 'author_id'
+    )
+    author_recipes = defaultdict(list)
+    for recipe in recipes:
+        author_recipes[recipe.author_id].append(recipe)
+    for author in authors:
+        author.limited_recipes = author_recipes[author.id]
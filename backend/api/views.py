@@ -1,13 +1,16 @@
-import csv
+import os
 
+from django.conf import settings
+from django.db import transaction
 from django.urls import reverse
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import Count, Exists, Max, OuterRef, Prefetch, Value
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
-from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound
 from djoser.views import UserViewSet
@@ -15,9 +18,30 @@ from djoser.views import UserViewSet
 from http import HTTPStatus
 
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from .mixins import ConditionalGetMixin
+from .pagination import (
+    CustomPagination,
+    RecipePagination,
+    SubscriptionPagination,
+)
 from .permissions import AdminOrAuthorOrReadOnly
-from .utils import generate_short_link_code
+from . import shortcodes
+from .cache import (
+    catalogue_cache,
+    recipe_fragment_cache,
+    short_link_cache,
+)
+from .exports import EXPORT_FORMATS, shopping_cart_ingredients
+from .renderers import CSVRenderer, PlainTextRenderer
+from .search import ingredient_index
+from .representations import (
+    RECIPE_FIELDS,
+    SHORT_RECIPE_FIELDS,
+    SUBSCRIPTION_FIELDS,
+    represent_recipes,
+    represent_subscriptions,
+)
+from .utils import attach_author_recipes, get_author_recipes
 from .serializers import (
     CreateRecipeSerializer,
     IngredientSerializer,
@@ -62,7 +86,13 @@ class CustomUserViewSet(UserViewSet):
         if request.method == 'PUT':
             serializer.update(user, request.data)
             avatar_url = request.build_absolute_uri(user.avatar.url)
-            return Response({'avatar': avatar_url}, status=status.HTTP_200_OK)
+            return Response(
+                {
+                    'avatar': avatar_url,
+                    'avatar_status': user.avatar_variants.get('status'),
+                },
+                status=status.HTTP_200_OK
+            )
 
         serializer.delete_avatar()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -71,15 +101,25 @@ class CustomUserViewSet(UserViewSet):
         detail=False,
         methods=['get'],
         permission_classes=[IsAuthenticated],
-        url_path='subscriptions'
+        url_path='subscriptions',
+        pagination_class=SubscriptionPagination,
     )
     def subscriptions(self, request):
-        user = request.user
-        subscribed_users = user.subscriptions.all()
-        users = User.objects.filter(
-            id__in=subscribed_users.values_list('author', flat=True)
-        )
+        users = User.objects.filter(subscribers__user=request.user).annotate(
+            recipes_count=Count('recipes'),
+            is_subscribed=Value(True),
+        ).order_by('id')
+        limit = request.GET.get('recipes_limit')
+        if settings.FAST_READ_SERIALIZERS:
+            page = self.paginate_queryset(users.values(*SUBSCRIPTION_FIELDS))
+            recipes = get_author_recipes(
+                [row['id'] for row in page], limit
+            ).values(*SHORT_RECIPE_FIELDS)
+            return self.get_paginated_response(
+                represent_subscriptions(page, recipes, request)
+            )
         page = self.paginate_queryset(users)
+        attach_author_recipes(page, limit)
         serializer = SubscriptionSerializer(
             page,
             many=True,
@@ -121,28 +161,171 @@ class CustomUserViewSet(UserViewSet):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+def get_catalogue_response(request, name, version=None):
+    """Готовый ответ из кэша справочников или None."""
+    renderer = request.accepted_renderer
+    if request.query_params or not isinstance(
+        renderer, catalogue_cache.renderer_class
+    ):
+        return None
+    content = catalogue_cache.get(name, version)
+    return HttpResponse(content, content_type=renderer.media_type)
+
+
+def get_object_version(queryset, pk):
+    try:
+        updated_at = queryset.filter(pk=pk).values_list(
+            'updated_at', flat=True
+        ).first()
+    except ValueError:
+        return None
+    if updated_at is None:
+        return None
+    return updated_at, updated_at
+
+
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list_response(self, request, *args, **kwargs):
+        params = request.query_params
+        if any(params.get(name) for name in IngredientFilter.Meta.fields):
+            ingredients = ingredient_index.search(
+                name=params.get('name'),
+                starts_with=params.get('name_starts_with'),
+                contains=params.get('name_contains'),
+                version=self.catalogue_version,
+            )
+            if ingredients is not None:
+                return Response(ingredients)
+        return get_catalogue_response(
+            request, 'ingredients', self.catalogue_version
+        ) or super().list_response(request, *args, **kwargs)
+
+    def get_list_version(self):
+        self.catalogue_version = catalogue_cache.get_version('ingredients')
+        return self.catalogue_version, None
+
+    def get_object_version(self):
+        return get_object_version(Ingredient.objects.all(), self.kwargs['pk'])
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     filter_backends = (DjangoFilterBackend,)
 
+    def list_response(self, request, *args, **kwargs):
+        return get_catalogue_response(
+            request, 'tags', self.catalogue_version
+        ) or super().list_response(request, *args, **kwargs)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def get_list_version(self):
+        self.catalogue_version = catalogue_cache.get_version('tags')
+        return self.catalogue_version, None
 
-    queryset = Recipe.objects.all()
-    pagination_class = CustomPagination
+    def get_object_version(self):
+        return get_object_version(Tag.objects.all(), self.kwargs['pk'])
+
+
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (AdminOrAuthorOrReadOnly,)
+    vary_on_user = True
+
+    def get_viewer_annotations(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return dict(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+        return dict(
+            is_favorited=Exists(
+                Favorite.objects.filter(author=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(author=user, recipe=OuterRef('pk'))
+            ),
+            author_is_subscribed=Exists(
+                Subscription.objects.filter(
+                    user=user, author=OuterRef('author')
+                )
+            ),
+        )
+
+    def get_queryset(self):
+        return Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        ).annotate(**self.get_viewer_annotations())
+
+    def list_response(self, request, *args, **kwargs):
+        if not settings.FAST_READ_SERIALIZERS:
+            return super().list_response(request, *args, **kwargs)
+        # Строки без моделей и сериализаторов; теги и ингредиенты
+        # загружаются двумя запросами на страницу.
+        recipes = self.filter_queryset(
+            Recipe.objects.annotate(**self.get_viewer_annotations())
+        ).values(*RECIPE_FIELDS)
+        page = self.paginate_queryset(recipes)
+        if page is None:
+            return Response(represent_recipes(recipes, request))
+        return self.get_paginated_response(represent_recipes(page, request))
+
+    def get_object_version(self):
+        # Всё, от чего зависит ответ, одним запросом без сериализации.
+        # Удаление тега или ингредиента меняет количество связей.
+        try:
+            row = Recipe.objects.filter(pk=self.kwargs['pk']).annotate(
+                tags_updated_at=Max('tags__updated_at'),
+                tags_count=Count('tags', distinct=True),
+                ingredients_updated_at=Max('ingredients__updated_at'),
+                ingredients_count=Count('recipe_ingredients', distinct=True),
+                **self.get_viewer_annotations(),
+            ).values_list(
+                'updated_at', 'tags_updated_at', 'tags_count',
+                'ingredients_updated_at', 'ingredients_count',
+                'author__email', 'author__username', 'author__first_name',
+                'author__last_name', 'author__avatar',
+                'author__avatar_variants', 'is_favorited',
+                'is_in_shopping_cart', 'author_is_subscribed',
+            ).first()
+        except ValueError:
+            return None
+        if row is None:
+            return None
+        self.fragment_version = row[:-3]
+        self.viewer_flags = row[-3:]
+        return self.fragment_version + self.viewer_flags, None
+
+    def retrieve_response(self, request, *args, **kwargs):
+        if request.query_params or not hasattr(self, 'fragment_version'):
+            return super().retrieve_response(request, *args, **kwargs)
+        # Ссылки на изображения абсолютные, поэтому ключ зависит от хоста.
+        key = recipe_fragment_cache.get_key(
+            self.kwargs['pk'],
+            (self.fragment_version, request.build_absolute_uri('/')),
+        )
+        fragment = recipe_fragment_cache.get(key)
+        if fragment is None:
+            fragment = self.get_serializer(self.get_object()).data
+            recipe_fragment_cache.set(key, fragment)
+        return Response(
+            recipe_fragment_cache.merge(fragment, *self.viewer_flags)
+        )
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -157,7 +340,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if model.objects.filter(recipe=recipe, author=user).exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        model.objects.create(recipe=recipe, author=user)
+        # Список покупок обновляют обработчики сигналов ShoppingCart.
+        with transaction.atomic():
+            model.objects.create(recipe=recipe, author=user)
         serializer = ShoppingCartRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -165,7 +350,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = get_object_or_404(Recipe, id=pk)
         obj = model.objects.filter(recipe=recipe, author=user).first()
         if obj:
-            obj.delete()
+            with transaction.atomic():
+                obj.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -186,32 +372,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=False,
         permission_classes=(IsAuthenticated,),
         methods=['get'],
-        url_path='download_shopping_cart'
+        url_path='download_shopping_cart',
+        renderer_classes=(CSVRenderer, PlainTextRenderer, JSONRenderer),
     )
     def download_shopping_cart(self, request):
-        user = request.user
-
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__author=user
-        ).values('ingredient__name', 'ingredient__measurement_unit').annotate(
-            ingredients_amount=Sum('amount')
+        renderer = request.accepted_renderer
+        export = EXPORT_FORMATS[renderer.format]
+        response = StreamingHttpResponse(
+            export(shopping_cart_ingredients(request.user)),
+            content_type=f'{renderer.media_type}; charset=utf-8'
         )
-
-        response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.csv"'
+            f'attachment; filename="shopping_cart.{renderer.format}"'
         )
-        writer = csv.writer(response)
-        writer.writerow(['Ingredient', 'Amount'])
-
-        for ingredient in ingredients:
-            writer.writerow([
-                ingredient['ingredient__name'],
-                ingredient['ingredient__measurement_unit'],
-                ingredient['ingredients_amount']
-            ]
-            )
-
         return response
 
     @action(
@@ -222,9 +395,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_link(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
 
-        short_link_code = generate_short_link_code(recipe.id)
         short_link = request.build_absolute_uri(
-            reverse('short_link', kwargs={'pk': short_link_code})
+            reverse('short_link', kwargs={'pk': shortcodes.encode(recipe.id)})
         )
 
         return Response({'short-link': short_link}, status=status.HTTP_200_OK)
@@ -243,15 +415,39 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.delete_recipe(Favorite, author, pk)
 
 
-def short_link(request, pk):
-    recipes = Recipe.objects.all()
+def resolve_short_link(code):
+    recipe_id = shortcodes.decode(code)
+    if recipe_id is None:
+        return Recipe.objects.filter(legacy_short_code=code).values_list(
+            'id', flat=True
+        ).first()
+    if Recipe.objects.filter(pk=recipe_id).exists():
+        return recipe_id
+    return None
 
-    for recipe in recipes:
-        id_recipe = generate_short_link_code(recipe.id)
-        if id_recipe == pk:
-            return redirect(f'/recipes/{recipe.id}/')
+
+def short_link(request, pk):
+    recipe_id = None
+    cache_status = 'HIT'
+    if pk.isascii() and pk.isalnum():
+        recipe_id = short_link_cache.get(pk)
+        if recipe_id is None:
+            cache_status = 'MISS'
+            recipe_id = resolve_short_link(pk) or 0
+            short_link_cache.set(pk, recipe_id)
+    if recipe_id:
+        response = redirect(f'/recipes/{recipe_id}/')
+        response['X-Cache'] = cache_status
+        return response
 
     raise NotFound(
         detail=f'Не существует рецепта с коротким кодом {pk}',
         code=HTTPStatus.NOT_FOUND
     )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def short_link_stats(request):
+    """Счётчики кэша коротких ссылок процесса, ответившего на запрос."""
+    return Response({'pid': os.getpid(), **short_link_cache.stats()})
@@ -138,6 +138,17 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
@@ -155,3 +166,54 @@ DJOSER = {
 
 MIN_VALUE = 1
 MAX_VALUE = 32000
+
+SHORT_LINK_SALT = int(os.getenv('SHORT_LINK_SALT', default='2024102020'))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+SHORT_LINK_CACHE_ALIAS = os.getenv('SHORT_LINK_CACHE_ALIAS', default='default')
+SHORT_LINK_CACHE_SIZE = 1024
+SHORT_LINK_CACHE_LOCAL_TIMEOUT = 60
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60
+SHORT_LINK_CACHE_NEGATIVE_TIMEOUT = 60
+
+INGREDIENT_INDEX_MAX_SIZE = 50000
+INGREDIENT_INDEX_TIMEOUT = 5 * 60
+INGREDIENT_TRIGRAM_SEARCH = (
+    os.getenv('INGREDIENT_TRIGRAM_SEARCH', 'True') == 'True'
+)
+
+PAGINATION_COUNT_CACHE_TIMEOUT = 30
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = (
+    int(os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD', default='100000'))
+    or None
+)
+
+IMAGE_PROCESSING_ASYNC = (
+    os.getenv('IMAGE_PROCESSING_ASYNC', 'False') == 'True'
+)
+IMAGE_TASK_MAX_ATTEMPTS = 3
+
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', default=str(10 * 1024 * 1024))
+)
+IMAGE_UPLOAD_MAX_PIXELS = 50_000_000
+
+CATALOGUE_CACHE_TIMEOUT = 5 * 60
+
+RECIPE_FRAGMENT_CACHE_ALIAS = os.getenv(
+    'RECIPE_FRAGMENT_CACHE_ALIAS', default='default'
+)
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+FAST_READ_SERIALIZERS = (
+    os.getenv('FAST_READ_SERIALIZERS', 'True') == 'True'
+)
@@ -0,0 +1,59 @@
+import hashlib
+import posixpath
+
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models.fields.files import ImageFieldFile
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def lock_blob(name):
+    """Строка учёта файла, заблокированная до конца транзакции."""
+    blob, _ = apps.get_model(
+        'recipes', 'MediaBlob'
+    ).objects.select_for_update().get_or_create(name=name)
+    return blob
+
+
+class ContentAddressedFieldFile(ImageFieldFile):
+    """Файл с именем по SHA-256 содержимого.
+
+    Одинаковые загрузки получают одно имя, поэтому повторная загрузка
+    уже сохранённого изображения не записывает файл заново.
+    Проверка наличия, запись и учёт ссылки идут под блокировкой
+    строки MediaBlob, чтобы файл не удалили между ними.
+    """
+
+    def save(self, name, content, save=True):
+        extension = posixpath.splitext(name)[1].lower()
+        name = content_hash(content) + extension
+        stored_name = self.field.generate_filename(self.instance, name)
+        with transaction.atomic():
+            blob = lock_blob(stored_name)
+            if self.storage.exists(stored_name):
+                self.name = stored_name
+                setattr(self.instance, self.field.attname, self.name)
+                self._committed = True
+            else:
+                super().save(name, content, save=False)
+            blob.refcount += 1
+            blob.save(update_fields=('refcount',))
+        # Ссылка уже учтена, update_references() не учитывает её снова.
+        self.instance._acquired_media = {
+            **getattr(self.instance, '_acquired_media', {}),
+            self.field.attname: self.name,
+        }
+        if save:
+            self.instance.save()
+
+
+class ContentAddressedImageField(models.ImageField):
+    attr_class = ContentAddressedFieldFile
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+# Справочники тегов и ингредиентов рендерятся до первого запроса.
+from api.cache import catalogue_cache  # noqa: E402
+
+catalogue_cache.warm()
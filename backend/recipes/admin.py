@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from .models import (
     Favorite,
+    ImageTask,
     Ingredient,
     Recipe,
     ShoppingCart,
@@ -16,3 +17,4 @@ admin.site.register(Ingredient)
 admin.site.register(Tag)
 admin.site.register(Favorite)
 admin.site.register(ShoppingCart)
+admin.site.register(ImageTask)
@@ -0,0 +1,101 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import Ingredient
+
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if len(row) >= 2:
+                yield row[0], row[1]
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as file:
+        try:
+            items = json.load(file)
+        except json.JSONDecodeError as error:
+            raise CommandError(f'{path}: некорректный JSON ({error}).')
+    if not isinstance(items, list):
+        raise CommandError(f'{path}: ожидается список ингредиентов.')
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not all(
+            isinstance(item.get(field), str)
+            for field in ('name', 'measurement_unit')
+        ):
+            raise CommandError(
+                f'{path}: запись {position} без name или '
+                f'measurement_unit: {item!r}'
+            )
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class Command(BaseCommand):
+    help = 'Загружает справочник ингредиентов из CSV или JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            type=Path,
+            default=[DEFAULT_PATH],
+            help='Файлы .csv (название,единица) или .json.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одном INSERT.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        seen = set()
+        read = 0
+        batch = []
+        with transaction.atomic():
+            for path in options['paths']:
+                reader = READERS.get(path.suffix.lower())
+                if reader is None:
+                    raise CommandError(f'Неизвестный формат файла: {path}')
+                if not path.is_file():
+                    raise CommandError(f'Файл не найден: {path}')
+                for name, measurement_unit in reader(path):
+                    read += 1
+                    key = (name.strip(), measurement_unit.strip())
+                    if not all(key) or key in seen:
+                        continue
+                    seen.add(key)
+                    batch.append(
+                        Ingredient(name=key[0], measurement_unit=key[1])
+                    )
+                    if len(batch) >= batch_size:
+                        self.save(batch)
+                        batch = []
+            self.save(batch)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {read}, уникальных: {len(seen)}, '
+            f'за {elapsed:.2f} с ({read / max(elapsed, 1e-9):.0f} строк/с).'
+        ))
+
+    def save(self, batch):
+        # Ключ конфликта совпадает со всеми полями ингредиента, обновлять
+        # при конфликте нечего, поэтому существующие строки пропускаются.
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает или проверяет агрегированные списки покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить списки с корзинами, ничего не изменяя.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            shopping_list.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок пересчитаны.')
+            )
+            return
+        mismatches = shopping_list.verify()
+        for (author_id, ingredient_id), (expected, actual) in sorted(
+            mismatches.items()
+        ):
+            self.stdout.write(
+                f'Пользователь {author_id}, ингредиент {ingredient_id}: '
+                f'ожидается {expected}, сохранено {actual}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {len(mismatches)}. '
+                'Запустите команду без --verify.'
+            )
+        self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
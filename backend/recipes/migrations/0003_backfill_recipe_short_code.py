@@ -0,0 +1,44 @@
+import hashlib
+
+from django.db import migrations
+
+SHORT_LINK_LENGTH = 6
+BATCH_SIZE = 1000
+
+
+def backfill_short_codes(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    taken = set(
+        Recipe.objects.exclude(short_code=None).values_list(
+            'short_code', flat=True
+        )
+    )
+    batch = []
+    # Порядок совпадает с прежним перебором в short_link, поэтому
+    # при коллизии короткий код остаётся за тем же рецептом.
+    recipes = Recipe.objects.filter(short_code=None).order_by('name', 'id')
+    for recipe in recipes.only('id').iterator(chunk_size=BATCH_SIZE):
+        digest = hashlib.md5(str(recipe.id).encode()).hexdigest()
+        length = SHORT_LINK_LENGTH
+        while digest[:length] in taken:
+            length += 1
+        recipe.short_code = digest[:length]
+        taken.add(recipe.short_code)
+        batch.append(recipe)
+        if len(batch) >= BATCH_SIZE:
+            Recipe.objects.bulk_update(batch, ['short_code'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['short_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_short_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_short_codes, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.14 on 2026-10-18 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_backfill_recipe_short_code'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='recipe',
+            old_name='short_code',
+            new_name='legacy_short_code',
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='legacy_short_code',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True, verbose_name='Устаревший короткий код'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import Sum
+
+BATCH_SIZE = 1000
+
+
+def fill_shopping_list_items(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    totals = RecipeIngredient.objects.filter(
+        recipe__shopping_cart__isnull=False
+    ).values_list(
+        'recipe__shopping_cart__author', 'ingredient'
+    ).annotate(total_amount=Sum('amount')).order_by()
+    batch = []
+    for author_id, ingredient_id, amount in totals.iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        batch.append(ShoppingListItem(
+            author_id=author_id, ingredient_id=ingredient_id, amount=amount
+        ))
+        if len(batch) >= BATCH_SIZE:
+            ShoppingListItem.objects.bulk_create(batch)
+            batch = []
+    ShoppingListItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_shopping_list_items, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.14 on 2026-10-18 00:21
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+MAX_AMOUNT = 32000
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(count=Count('id'), keep_id=Min('id')).filter(count__gt=1)
+    for group in duplicates:
+        duplicate_ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep_id']).values_list('id', flat=True))
+        for model, owner, limit in (
+            (RecipeIngredient, 'recipe_id', MAX_AMOUNT),
+            (ShoppingListItem, 'author_id', None),
+        ):
+            kept = {
+                getattr(row, owner): row
+                for row in model.objects.filter(ingredient_id=group['keep_id'])
+            }
+            for row in model.objects.filter(ingredient_id__in=duplicate_ids):
+                target = kept.get(getattr(row, owner))
+                if target is None:
+                    row.ingredient_id = group['keep_id']
+                    row.save(update_fields=['ingredient'])
+                    kept[getattr(row, owner)] = row
+                    continue
+                target.amount += row.amount
+                if limit is not None:
+                    target.amount = min(target.amount, limit)
+                target.save(update_fields=['amount'])
+                row.delete()
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_ingredient_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_measurement_unit'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.14 on 2026-10-18 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_ingredient_unique_name_measurement_unit'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['name', 'id'], name='recipe_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from collections import Counter
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_media_blobs(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    MediaBlob = apps.get_model('recipes', 'MediaBlob')
+    refcounts = Counter(
+        Recipe.objects.exclude(image='').values_list('image', flat=True)
+    )
+    refcounts.update(
+        User.objects.exclude(avatar='').exclude(avatar=None).values_list(
+            'avatar', flat=True
+        )
+    )
+    MediaBlob.objects.all().delete()
+    MediaBlob.objects.bulk_create(
+        [
+            MediaBlob(name=name, refcount=refcount)
+            for name, refcount in refcounts.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_mediablob'),
+        ('users', '0003_avatar_content_addressed'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_media_blobs, migrations.RunPython.noop
+        ),
+    ]
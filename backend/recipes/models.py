@@ -4,6 +4,7 @@ from django.core.validators import MaxValueValidator, MinValueValidator
 
 from users.models import User
 from foodgram.settings import MIN_VALUE, MAX_VALUE
+from foodgram.storage import ContentAddressedImageField
 
 
 class Tag(models.Model):
@@ -17,6 +18,7 @@ class Tag(models.Model):
         max_length=200,
         unique=True,
     )
+    updated_at = models.DateTimeField('Изменён', auto_now=True)
 
     class Meta:
         verbose_name = 'Тег'
@@ -37,11 +39,18 @@ class Ingredient(models.Model):
         'Единицы измерения',
         max_length=200,
     )
+    updated_at = models.DateTimeField('Изменён', auto_now=True)
 
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = [
+            UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_name_measurement_unit'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -60,9 +69,15 @@ class Recipe(models.Model):
         max_length=200,
         db_index=True,
     )
-    image = models.ImageField(
+    image = ContentAddressedImageField(
         upload_to='recipes/'
     )
+    image_variants = models.JSONField(
+        'Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         'Описание',
         max_length=300,
@@ -85,11 +100,23 @@ class Recipe(models.Model):
             MaxValueValidator(MAX_VALUE)
         ]
     )
+    legacy_short_code = models.CharField(
+        'Устаревший короткий код',
+        max_length=32,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    updated_at = models.DateTimeField('Изменён', auto_now=True)
 
     class Meta:
         ordering = ('name',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=('name', 'id'), name='recipe_name_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -188,3 +215,88 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.recipe.name}'
+
+
+class ShoppingListItem(models.Model):
+
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=('author', 'ingredient'),
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient.name}'
+
+
+class ImageTask(models.Model):
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (PROCESSING, 'Обрабатывается'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    model_label = models.CharField('Модель', max_length=100)
+    object_id = models.PositiveBigIntegerField('ID объекта')
+    field_name = models.CharField('Поле', max_length=100)
+    source = models.CharField('Файл', max_length=255)
+    status = models.CharField(
+        'Статус',
+        max_length=20,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    error = models.TextField('Ошибка', blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    updated_at = models.DateTimeField('Обновлена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Обработка изображения'
+        verbose_name_plural = 'Обработка изображений'
+        ordering = ('created_at',)
+        indexes = [
+            models.Index(
+                fields=('status', 'created_at'),
+                name='imagetask_status_created_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.model_label}:{self.object_id} {self.source}'
+
+
+class MediaBlob(models.Model):
+
+    name = models.CharField('Файл', max_length=255, unique=True)
+    refcount = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.db.models import Sum
+
+from users.models import User
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def get_recipe_amounts(recipe):
+    return dict(
+        RecipeIngredient.objects.filter(recipe=recipe).values_list(
+            'ingredient_id', 'amount'
+        )
+    )
+
+
+def apply_amount_changes(author_ids, changes):
+    changes = {
+        ingredient_id: change
+        for ingredient_id, change in changes.items() if change
+    }
+    if not author_ids or not changes:
+        return
+    with transaction.atomic():
+        # Изменения списков одного пользователя выполняются по очереди,
+        # иначе две параллельные вставки одной позиции нарушат
+        # unique_shopping_list_item. NO KEY UPDATE не конфликтует с
+        # блокировками внешних ключей от вставки строк корзины.
+        list(User.objects.select_for_update(no_key=True).filter(
+            id__in=author_ids
+        ).order_by('id').values_list('id', flat=True))
+        items = {
+            (item.author_id, item.ingredient_id): item
+            for item in ShoppingListItem.objects.select_for_update().filter(
+                author_id__in=author_ids,
+                ingredient_id__in=changes,
+            )
+        }
+        new_items, changed_items, empty_item_ids = [], [], []
+        for author_id in author_ids:
+            for ingredient_id, change in changes.items():
+                item = items.get((author_id, ingredient_id))
+                if item is None:
+                    if change > 0:
+                        new_items.append(ShoppingListItem(
+                            author_id=author_id,
+                            ingredient_id=ingredient_id,
+                            amount=change,
+                        ))
+                    continue
+                item.amount += change
+                if item.amount > 0:
+                    changed_items.append(item)
+                else:
+                    empty_item_ids.append(item.id)
+        ShoppingListItem.objects.bulk_create(new_items, batch_size=BATCH_SIZE)
+        ShoppingListItem.objects.bulk_update(
+            changed_items, ['amount'], batch_size=BATCH_SIZE
+        )
+        ShoppingListItem.objects.filter(id__in=empty_item_ids).delete()
+
+
+def get_removed_amounts(recipe):
+    return {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipe_amounts(recipe).items()
+    }
+
+
+def add_recipe(author_id, recipe_id):
+    apply_amount_changes([author_id], get_recipe_amounts(recipe_id))
+
+
+def remove_recipe(author_id, recipe_id):
+    apply_amount_changes([author_id], get_removed_amounts(recipe_id))
+
+
+def change_recipe(recipe, changes):
+    if not any(changes.values()):
+        return
+    apply_amount_changes(
+        list(ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'author_id', flat=True
+        )),
+        changes,
+    )
+
+
+def delete_recipe(recipe):
+    change_recipe(recipe, get_removed_amounts(recipe))
+
+
+def get_expected_items():
+    return RecipeIngredient.objects.filter(
+        recipe__shopping_cart__isnull=False
+    ).values_list(
+        'recipe__shopping_cart__author', 'ingredient'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by()
+
+
+def rebuild():
+    with transaction.atomic():
+        ShoppingListItem.objects.all().delete()
+        batch = []
+        for author_id, ingredient_id, amount in get_expected_items().iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            batch.append(ShoppingListItem(
+                author_id=author_id, ingredient_id=ingredient_id, amount=amount
+            ))
+            if len(batch) >= BATCH_SIZE:
+                ShoppingListItem.objects.bulk_create(batch)
+                batch = []
+        ShoppingListItem.objects.bulk_create(batch)
+
+
+def verify():
+    expected = {
+        (author_id, ingredient_id): amount
+        for author_id, ingredient_id, amount in get_expected_items()
+    }
+    actual = {
+        (author_id, ingredient_id): amount
+        for author_id, ingredient_id, amount
+        in ShoppingListItem.objects.values_list(
+            'author_id', 'ingredient_id', 'amount'
+        )
+    }
+    return {
+        key: (expected.get(key), actual.get(key))
+        for key in expected.keys() | actual.keys()
+        if expected.get(key) != actual.get(key)
+    }
@@ -0,0 +1,50 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from recipes.models import Ingredient
+
+
+class LoadIngredientsTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, content):
+        path = self.directory / 'ingredients.json'
+        path.write_text(content, encoding='utf-8')
+        return str(path)
+
+    def load(self, path):
+        call_command('load_ingredients', path, stdout=StringIO())
+
+    def test_loads_json(self):
+        self.load(self.write(json.dumps(
+            [{'name': 'Соль', 'measurement_unit': 'г'}], ensure_ascii=False
+        )))
+        self.assertTrue(Ingredient.objects.filter(name='Соль').exists())
+
+    def test_invalid_files(self):
+        cases = (
+            ('', 'некорректный JSON'),
+            ('{}', 'ожидается список'),
+            ('[{"name": "Соль"}]', "запись 0 без name или measurement_unit"),
+            ('[["Соль", "г"]]', 'запись 0'),
+        )
+        for content, message in cases:
+            with self.subTest(content=content):
+                path = self.write(content)
+                with self.assertRaisesMessage(CommandError, message):
+                    self.load(path)
+                with self.assertRaisesMessage(CommandError, path):
+                    self.load(path)
+        with self.assertRaisesMessage(CommandError, 'Файл не найден'):
+            self.load(str(self.directory / 'missing.json'))
+        self.assertFalse(Ingredient.objects.exists())
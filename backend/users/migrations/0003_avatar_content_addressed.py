@@ -0,0 +1,19 @@
+# Generated by Django 4.2.14 on 2026-10-18 00:31
+
+from django.db import migrations
+import foodgram.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=foodgram.storage.ContentAddressedImageField(blank=True, null=True, upload_to='avatars/'),
+        ),
+    ]
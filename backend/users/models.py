@@ -2,6 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db.models.constraints import UniqueConstraint
 from django.db import models
 
+from foodgram.storage import ContentAddressedImageField
+
 
 class User(AbstractUser):
 
@@ -18,11 +20,17 @@ class User(AbstractUser):
         'Фамилия',
         max_length=150
     )
-    avatar = models.ImageField(
+    avatar = ContentAddressedImageField(
         upload_to='avatars/',
         null=True,
         blank=True
     )
+    avatar_variants = models.JSONField(
+        'Уменьшенные копии аватара',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']